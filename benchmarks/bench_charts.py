@@ -0,0 +1,33 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts import RENDERERS
+
+
+def bench(name, render, runs):
+    start = time.perf_counter()
+    render(0, 2000, 0, 2000)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(runs):
+        render(100 + i, 2600, 1500.5 + i, 2100)
+    per_image = (time.perf_counter() - start) / runs
+    print(f"{name:<12} первый вызов (с импортом): {first * 1000:8.1f} мс   "
+          f"на изображение: {per_image * 1000:8.2f} мс")
+    return per_image
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение рендереров графика прогресса")
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+    results = {name: bench(name, render, args.runs) for name, render in RENDERERS.items()}
+    print(f"pillow быстрее matplotlib в {results['matplotlib'] / results['pillow']:.1f} раз")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import UserStore, create_backend
+
+
+async def naive_increment(store, user_id, field, delta):
+    profile = await store.get(user_id)
+    await asyncio.sleep(0)
+    profile[field] += delta
+    store.mark_dirty(user_id)
+
+
+async def atomic_increment(store, user_id, field, delta):
+    await store.increment(user_id, **{field: delta})
+
+
+async def stress_store(args, backend_name, path):
+    store = UserStore(create_backend(backend_name, path=path), cache_size=args.cache_size,
+                      flush_interval=0.01, batch_size=args.users)
+    for user_id in range(args.users):
+        store.set(user_id, {'logged_water': 0, 'logged_calories': 0})
+    await store.start()
+    increment = naive_increment if args.naive else atomic_increment
+    rng = random.Random(args.seed)
+    expected = {user_id: 0 for user_id in range(args.users)}
+
+    async def worker(operations):
+        for user_id, delta in operations:
+            if rng.random() < 0.3:
+                await asyncio.sleep(0)
+            await increment(store, user_id, 'logged_water', delta)
+
+    operations = [[] for _ in range(args.tasks)]
+    for i in range(args.operations):
+        user_id = rng.randrange(args.users)
+        expected[user_id] += 1
+        operations[i % args.tasks].append((user_id, 1))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(chunk) for chunk in operations))
+    elapsed = time.perf_counter() - started
+    await store.flush()
+    profiles = await store.backend.load_all()
+    await store.close()
+    return expected, {user_id: profile['logged_water'] for user_id, profile in profiles.items()}, elapsed
+
+
+async def stress_handlers(args):
+    from fake_services import FakeServices
+    from bench_load import prepare_environment
+    services = FakeServices()
+    await services.start()
+    data_dir = tempfile.mkdtemp()
+    args.send_limits = False
+    prepare_environment(args, services, data_dir)
+    os.environ['USER_CACHE_SIZE'] = str(args.cache_size)
+    import logging
+    import bot
+    logging.getLogger().setLevel(logging.WARNING)
+    bot.setup_handlers(bot.dp)
+    await bot.start_http_session()
+    for user_id in range(args.users):
+        bot.user_store.set(user_id, {"weight": 70, "height": 175, "age": 25, "activity": 60, "city": "Москва",
+                                     "water_goal": 2600, "calorie_goal": 2000, "logged_water": 0,
+                                     "logged_calories": 0, "burned_calories": 0})
+    rng = random.Random(args.seed)
+    expected = {user_id: 0 for user_id in range(args.users)}
+    updates = []
+    for i in range(args.operations):
+        user_id = rng.randrange(args.users)
+        expected[user_id] += 100
+        updates.append(bot.types.Update(update_id=i + 1, message={
+            'message_id': i + 1, 'date': int(time.time()), 'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'stress'}, 'text': "/log_water 100"}))
+
+    semaphore = asyncio.Semaphore(args.tasks)
+
+    async def feed(update):
+        async with semaphore:
+            await bot.dp.feed_update(bot.bot, update)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(feed(update) for update in updates))
+    elapsed = time.perf_counter() - started
+    actual = {user_id: (await bot.user_store.get(user_id))['logged_water'] for user_id in range(args.users)}
+    await bot.bot.session.close()
+    await bot.close_http_session()
+    await bot.user_store.close()
+    await bot.intake_log.close()
+    await services.stop()
+    return expected, actual, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Стресс-тест параллельных инкрементов: проверка потерянных обновлений")
+    parser.add_argument('--mode', choices=('store', 'handlers'), default='store',
+                        help="store — UserStore напрямую, handlers — /log_water через диспетчер")
+    parser.add_argument('--backend', choices=('memory', 'sqlite'), default='sqlite')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--operations', type=int, default=20000)
+    parser.add_argument('--tasks', type=int, default=500, help="параллельных задач")
+    parser.add_argument('--cache-size', type=int, default=10, help="размер LRU профилей, маленький — больше вытеснений")
+    parser.add_argument('--naive', action='store_true', help="read-modify-write без increment для сравнения")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.mode == 'store':
+        with tempfile.TemporaryDirectory() as data_dir:
+            expected, actual, elapsed = asyncio.run(stress_store(args, args.backend,
+                                                                 os.path.join(data_dir, 'users.sqlite')))
+    else:
+        expected, actual, elapsed = asyncio.run(stress_handlers(args))
+
+    lost = sum(expected[user_id] - actual.get(user_id, 0) for user_id in expected)
+    wrong = sum(1 for user_id in expected if expected[user_id] != actual.get(user_id, 0))
+    print(f"{args.operations} инкрементов, {args.tasks} задач, {args.users} пользователей: {elapsed:.2f} с "
+          f"({args.operations / elapsed:.0f} оп/с)")
+    print(f"Потеряно: {lost}, пользователей с неверной суммой: {wrong}")
+    sys.exit(1 if wrong else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from food_db import BUNDLED_CSV, MIN_SCORE, FoodIndex, build_index, normalize_name, read_bundled_csv, trigrams
+
+QUERIES = ['банан', 'молоко', 'курица', 'гречка', 'яблоко', 'картофельное пюре', 'йогурт клубничный',
+           'шоколадное молоко', 'овсяная каша', 'сыр', 'творог 5%']
+EXTRA_WORDS = ['йогурт', 'клубничный', 'питьевой', 'молочный', 'шоколадный', 'классический', 'натуральный',
+               'бзмж', 'organic', 'light', 'original', 'vanilla', 'strawberry', 'chocolate', 'yogurt', 'milk',
+               'cheese', 'sauce']
+BRANDS = ['', '', 'ооо', 'ltd', 'fresh', 'domik', 'вкусно']
+
+
+def synthetic_foods(rng, count, bundled):
+    # названия в духе выгрузки OpenFoodFacts: 2-5 слов из общего словаря, бренд и номер партии,
+    # поэтому частые слова встречаются в десятках тысяч названий
+    words = set(EXTRA_WORDS)
+    for _, _, aliases in bundled:
+        for alias in aliases:
+            words.update(normalize_name(alias).split())
+    words = sorted(words)
+    foods = []
+    for _ in range(count):
+        name = ' '.join(rng.choice(words) for _ in range(rng.randint(2, 5)))
+        suffix = f"{rng.choice(BRANDS)}{rng.randint(1, 999) if rng.random() < 0.3 else ''}"
+        name = f"{name} {suffix}".strip()
+        foods.append((name, rng.uniform(20, 600), [name]))
+    return foods
+
+
+def exhaustive_lookup(aliases, query, min_score):
+    # все продукты с лучшим коэффициентом: при равенстве индекс вправе вернуть любой из них
+    grams = trigrams(normalize_name(query))
+    best_foods, best_score = set(), min_score
+    for food_id, alias_grams in aliases:
+        score = 2 * len(grams & alias_grams) / (len(grams) + len(alias_grams))
+        if score > best_score + 1e-12:
+            best_foods, best_score = {food_id}, score
+        elif score >= best_score - 1e-12:
+            best_foods.add(food_id)
+    return best_foods
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка и поиск по индексу продуктов объёма выгрузки OpenFoodFacts")
+    parser.add_argument('--foods', type=int, default=300000, help="число синтетических продуктов поверх встроенных")
+    parser.add_argument('--queries', type=int, default=500, help="число случайных запросов из названий продуктов")
+    parser.add_argument('--repeat', type=int, default=5, help="повторов каждого запроса, берётся лучшее время")
+    parser.add_argument('--min-score', type=float, default=MIN_SCORE)
+    parser.add_argument('--check', action='store_true', help="сверить каждый ответ с полным перебором алиасов")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bundled = read_bundled_csv(BUNDLED_CSV)
+    foods = bundled + synthetic_foods(rng, args.foods, bundled)
+    started = time.perf_counter()
+    data = build_index(foods)
+    build_time = time.perf_counter() - started
+    index = FoodIndex(data)
+    print(f"{len(index)} продуктов, индекс {len(data) / 2 ** 20:.1f} МБ, сборка {build_time:.1f} с")
+
+    queries = QUERIES + [name for name, _, _ in rng.sample(foods, args.queries)]
+    timings = {}
+    for query in queries:
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            index.lookup(query, args.min_score)
+            elapsed = time.perf_counter() - started
+            timings[query] = min(timings.get(query, elapsed), elapsed)
+    for query in QUERIES:
+        print(f"  {query:<20} {timings[query] * 1000:7.2f} мс")
+    values = sorted(timings.values())
+    print(f"Все запросы: p50 {percentile(values, 0.5) * 1000:.2f} мс, p99 {percentile(values, 0.99) * 1000:.2f} мс, "
+          f"максимум {values[-1] * 1000:.2f} мс")
+
+    if args.check:
+        aliases, seen = [], set()
+        for food_id, (_, _, names) in enumerate(foods):
+            for alias in map(normalize_name, names):
+                if alias and alias not in seen:
+                    seen.add(alias)
+                    aliases.append((food_id, trigrams(alias)))
+        mismatches = 0
+        for query in queries:
+            expected = [foods[food_id][0] for food_id in exhaustive_lookup(aliases, query, args.min_score)]
+            found = index.lookup(query, args.min_score)
+            if (found['name'] not in expected) if found else expected:
+                mismatches += 1
+                print(f"  расхождение: {query!r}: {found} вместо {expected[:3]}")
+        print(f"Сверка с перебором: {len(queries)} запросов, расхождений {mismatches}")
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_services import FakeServices, add_arguments
+
+CITIES = ['Москва', 'Санкт-Петербург', 'Казань', 'Новосибирск', 'Екатеринбург', 'Сочи', 'Самара', 'Омск']
+LOCAL_FOODS = ['банан', 'яблоко', 'гречка', 'курица', 'творог', 'овсянка', 'огурец', 'картофельное пюре']
+WORKOUTS = ['бег', 'плавание', 'велосипед', 'йога', 'ходьба', 'силовая тренировка', 'футбол', 'теннис']
+SCENARIOS = {
+    'water': lambda rng: [f"/log_water {rng.choice((150, 200, 250, 330, 500))}"],
+    'food': lambda rng: [f"/log_food {rng.choice(LOCAL_FOODS)}", str(rng.randint(50, 400))],
+    'food_remote': lambda rng: [f"/log_food блюдо номер {rng.randint(1, 500)}", str(rng.randint(50, 400))],
+    'meal': lambda rng: ["/log_food " + ", ".join([f"{food} {rng.randint(50, 300)}"
+                                                   for food in rng.sample(LOCAL_FOODS, 2)] +
+                                                  [f"блюдо номер {rng.randint(1, 500)} {rng.randint(50, 300)}"])],
+    'workout': lambda rng: ["/log_workout " + ", ".join(f"{workout} {rng.randint(10, 90)}"
+                                                        for workout in rng.sample(WORKOUTS, rng.randint(1, 2)))],
+    'progress': lambda rng: ["/check_progress"],
+    'recommend': lambda rng: ["/get_recommendations"],
+    'profile': lambda rng: ["/set_profile", str(rng.randint(50, 120)), str(rng.randint(150, 200)),
+                            str(rng.randint(18, 70)), str(rng.choice((0, 30, 60, 90))), rng.choice(CITIES)]
+}
+DEFAULT_MIX = "water=30,food=20,food_remote=5,meal=10,workout=5,progress=20,recommend=5,profile=5"
+
+
+def mix_arg(value):
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"неизвестный сценарий: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def prepare_environment(args, services, data_dir):
+    os.environ.update(services.env())
+    os.environ.update({
+        'STORAGE_BACKEND': 'memory',
+        'NUTRITION_CACHE_PATH': os.path.join(data_dir, 'nutrition_cache.sqlite'),
+        'INTAKE_LOG_PATH': os.path.join(data_dir, 'intake_log.sqlite'),
+        'SCHEDULE_PATH': os.path.join(data_dir, 'schedules.sqlite'),
+        'GOAL_REFRESH_INTERVAL': '0'
+    })
+    for name in ('API_TOKEN', 'OPENWEATHER_API_KEY', 'NUTRITIONIX_API_KEY', 'NUTRITIONIX_APP_ID'):
+        os.environ.setdefault(name, '123456:bench' if name == 'API_TOKEN' else 'bench')
+    if not args.send_limits:
+        os.environ.update({'SEND_GLOBAL_RATE': '1000000', 'SEND_CHAT_RATE': '1000000', 'SEND_CHAT_BURST': '1000000'})
+
+
+class LoadTest:
+    def __init__(self, bot_module, args, services):
+        self.bot = bot_module
+        self.args = args
+        self.services = services
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.pending = {}
+        self.latencies = defaultdict(list)
+        self.rejected = 0
+        self.timeouts = 0
+
+    def make_update(self, user_id, text):
+        return {
+            'update_id': next(self.update_ids),
+            'message': {
+                'message_id': next(self.message_ids),
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}"},
+                'text': text
+            }
+        }
+
+    def track_completion(self):
+        handler = self.bot.update_queue.handler
+
+        async def tracked(update):
+            try:
+                return await handler(update)
+            finally:
+                future = self.pending.pop(update.update_id, None)
+                if future is not None and not future.done():
+                    future.set_result(None)
+
+        self.bot.update_queue.handler = tracked
+
+    def route_translation(self):
+        url = f"{self.services.urls['translate']}/translate"
+
+        def translate(text):
+            with urllib.request.urlopen(f"{url}?{urllib.parse.urlencode({'q': text})}", timeout=10) as response:
+                return json.load(response)['text']
+
+        self.bot.translate_to_english = translate
+
+    async def send(self, session, url, user_id, scenario, text):
+        update = self.make_update(user_id, text)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[update['update_id']] = future
+        started = time.perf_counter()
+        async with session.post(url, json=update) as response:
+            status = response.status
+        if status != 200:
+            self.pending.pop(update['update_id'], None)
+            self.rejected += 1
+            return
+        try:
+            await asyncio.wait_for(future, self.args.timeout)
+        except asyncio.TimeoutError:
+            self.pending.pop(update['update_id'], None)
+            self.timeouts += 1
+            return
+        self.latencies[scenario].append(time.perf_counter() - started)
+
+    async def run_user(self, session, url, user_id, deadline):
+        rng = random.Random(self.args.seed * 1000003 + user_id)
+        names = list(self.args.mix)
+        weights = [self.args.mix[name] for name in names]
+        plan = ['profile'] + [None] * self.args.steps
+        for scenario in plan:
+            if deadline and time.perf_counter() >= deadline:
+                return
+            scenario = scenario or rng.choices(names, weights)[0]
+            for text in SCENARIOS[scenario](rng):
+                await self.send(session, url, user_id, scenario, text)
+                if self.args.think:
+                    await asyncio.sleep(rng.expovariate(1000 / self.args.think))
+
+    async def run(self, url):
+        from aiohttp import ClientSession, TCPConnector
+        deadline = time.perf_counter() + self.args.duration if self.args.duration else None
+        async with ClientSession(connector=TCPConnector(limit=0)) as session:
+            started = time.perf_counter()
+            await asyncio.gather(*(self.run_user(session, url, self.args.first_user + i, deadline)
+                                   for i in range(self.args.users)))
+            return time.perf_counter() - started
+
+
+def report(test, elapsed, rss_before, rss_after, blocks_before, blocks_after, services, bot_module):
+    rows = {}
+    print(f"{'сценарий':<12}{'апдейтов':>10}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'max, мс':>10}")
+    overall = list(itertools.chain(*test.latencies.values()))
+    for scenario, values in sorted(test.latencies.items()) + [('всего', overall)]:
+        row = {'count': len(values), **{f"p{p}": percentile(values, p) * 1000 for p in (50, 95, 99)},
+               'max': max(values, default=0) * 1000}
+        rows[scenario] = row
+        print(f"{scenario:<12}{row['count']:>10}{row['p50']:>10.1f}{row['p95']:>10.1f}{row['p99']:>10.1f}"
+              f"{row['max']:>10.1f}")
+    queue = bot_module.update_queue.stats()
+    result = {
+        'latency_ms': rows,
+        'updates': len(overall),
+        'elapsed': elapsed,
+        'updates_per_second': len(overall) / elapsed if elapsed else 0.0,
+        'rejected': test.rejected,
+        'timeouts': test.timeouts,
+        'handler_failures': queue['failed'],
+        'rss_mb': {'before': rss_before, 'after': rss_after, 'growth': rss_after - rss_before},
+        'allocated_blocks_growth': blocks_after - blocks_before,
+        'upstream_calls': dict(services.calls),
+        'upstream_errors': dict(services.errors)
+    }
+    print(f"\n{len(overall)} апдейтов за {elapsed:.2f} с: {result['updates_per_second']:.1f} апдейтов/с, "
+          f"отклонено {test.rejected}, таймаутов {test.timeouts}, ошибок в хендлерах {queue['failed']}")
+    print(f"RSS: {rss_before:.1f} → {rss_after:.1f} МБ ({rss_after - rss_before:+.1f} МБ), "
+          f"блоков Python: {blocks_after - blocks_before:+d}")
+    print("Запросы к заглушкам: " + ", ".join(f"{name} {count}" for name, count in sorted(services.calls.items())))
+    return result
+
+
+async def run_benchmark(args, services, bot_module):
+    from aiohttp import web
+    runner = web.AppRunner(bot_module.app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    url = f"http://127.0.0.1:{runner.addresses[0][1]}/webhook"
+    try:
+        await bot_module.warm_up_task
+        test = LoadTest(bot_module, args, services)
+        test.track_completion()
+        test.route_translation()
+        gc.collect()
+        rss_before, blocks_before = rss_mb(), sys.getallocatedblocks()
+        elapsed = await test.run(url)
+        await bot_module.user_store.flush()
+        await bot_module.intake_log.flush()
+        gc.collect()
+        rss_after, blocks_after = rss_mb(), sys.getallocatedblocks()
+    finally:
+        await runner.cleanup()
+    return report(test, elapsed, rss_before, rss_after, blocks_before, blocks_after, services, bot_module)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест webhook на локальных заглушках внешних сервисов")
+    parser.add_argument('--users', type=int, default=200, help="одновременных пользователей")
+    parser.add_argument('--steps', type=int, default=20, help="сценариев на пользователя после настройки профиля")
+    parser.add_argument('--duration', type=float, default=0, help="ограничить прогон по времени, с")
+    parser.add_argument('--mix', type=mix_arg, default=mix_arg(DEFAULT_MIX),
+                        help=f"веса сценариев (по умолчанию {DEFAULT_MIX})")
+    parser.add_argument('--think', type=float, default=0, help="средняя пауза пользователя между сообщениями, мс")
+    parser.add_argument('--timeout', type=float, default=30, help="таймаут обработки одного апдейта, с")
+    parser.add_argument('--first-user', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--send-limits', action='store_true',
+                        help="оставить лимиты отправки SEND_* из конфигурации (по умолчанию сняты)")
+    parser.add_argument('--json', help="сохранить результаты в JSON")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    services = FakeServices(dict(args.latency), args.jitter, args.error_rate)
+    services.start_in_thread()
+    with tempfile.TemporaryDirectory() as data_dir:
+        prepare_environment(args, services, data_dir)
+        import logging
+        import bot as bot_module
+        bot_module.setup_handlers(bot_module.dp)
+        logging.getLogger().setLevel(logging.WARNING)
+        try:
+            result = asyncio.run(run_benchmark(args, services, bot_module))
+        finally:
+            services.stop_thread()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profiles import Profile, calculate_calorie_goal, calculate_calorie_goals, calculate_water_goal, \
+    calculate_water_goals
+
+CITIES = ['Москва', 'Санкт-Петербург', 'Казань', 'Новосибирск', 'Екатеринбург', 'Сочи', 'Самара', 'Омск']
+
+
+def synthetic_profile(rng, history_days):
+    weight, activity = rng.randint(45, 130), rng.choice((0, 30, 45, 60, 90, 120))
+    profile = {
+        "weight": weight,
+        "height": rng.randint(150, 205),
+        "age": rng.randint(16, 80),
+        "activity": activity,
+        "city": rng.choice(CITIES),
+        "water_goal": calculate_water_goal(weight, activity, 20),
+        "calorie_goal": 2000.0,
+        "logged_water": rng.randrange(0, 3000, 50),
+        "logged_calories": 0,
+        "burned_calories": 0
+    }
+    if history_days:
+        # у каждого профиля свои кольца с живыми значениями, как после месяца записей: общие списки
+        # или одни нули (кэшированные малые int) не попали бы в замер памяти
+        profile.update(timezone="Europe/Moscow", day=739000, reminders=True,
+                       history_water=[rng.randrange(500, 3500, 50) for _ in range(history_days)],
+                       history_calories=[round(rng.uniform(1200, 3200), 1) for _ in range(history_days)],
+                       history_burned=[rng.randrange(0, 900) for _ in range(history_days)])
+    return profile
+
+
+def measure(build):
+    # профили генерируются внутри замера, чтобы в нём учитывались все их объекты, включая значения колец
+    gc.collect()
+    started = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    tracemalloc.start()
+    profiles = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return profiles, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Память профилей (dict против Profile) и пересчёт норм воды")
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--history-days', type=int, default=0,
+                        help="длина колец истории в профиле, 0 — профиль сразу после /set_profile")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    def build(convert):
+        rng = random.Random(args.seed)
+        return {user_id: convert(synthetic_profile(rng, args.history_days)) for user_id in range(args.users)}
+
+    rng = random.Random(args.seed + 1)
+    temperatures = {city: rng.uniform(-10, 35) for city in CITIES}
+    dicts, dict_size, dict_time = measure(lambda: build(dict))
+    del dicts
+    profiles, slots_size, slots_time = measure(lambda: build(Profile.from_dict))
+    print(f"{args.users} профилей, история {args.history_days} дн. (время сборки включает генерацию)")
+    print(f"dict:    {dict_size / 2 ** 20:8.1f} МБ ({dict_size / args.users:.0f} Б на профиль), "
+          f"сборка {dict_time:.2f} с")
+    print(f"Profile: {slots_size / 2 ** 20:8.1f} МБ ({slots_size / args.users:.0f} Б на профиль), "
+          f"сборка {slots_time:.2f} с, экономия {1 - slots_size / dict_size:.0%}")
+
+    users = list(profiles.values())
+    started = time.perf_counter()
+    scalar = [calculate_water_goal(user['weight'], user['activity'], temperatures[user['city']]) for user in users]
+    scalar_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    weight = np.fromiter((user['weight'] for user in users), dtype=np.int64, count=len(users))
+    activity = np.fromiter((user['activity'] for user in users), dtype=np.int64, count=len(users))
+    temperature = np.fromiter((temperatures[user['city']] for user in users), dtype=np.float64, count=len(users))
+    gathered = time.perf_counter()
+    goals = calculate_water_goals(weight, activity, temperature)
+    computed = time.perf_counter()
+    goals = goals.tolist()
+    finished = time.perf_counter()
+    assert goals == scalar
+
+    print(f"Пересчёт норм воды по одному: {scalar_time * 1000:.0f} мс")
+    print(f"Пересчёт через NumPy: {(finished - started) * 1000:.0f} мс (сбор столбцов "
+          f"{(gathered - started) * 1000:.0f} мс, расчёт {(computed - gathered) * 1000:.1f} мс, "
+          f"обратно в список {(finished - computed) * 1000:.0f} мс)")
+
+    height = np.fromiter((user['height'] for user in users), dtype=np.int64, count=len(users))
+    age = np.fromiter((user['age'] for user in users), dtype=np.int64, count=len(users))
+    started = time.perf_counter()
+    calorie_goals = calculate_calorie_goals(weight, height, age, activity)
+    computed = time.perf_counter()
+    assert calorie_goals.tolist() == [calculate_calorie_goal(user['weight'], user['height'], user['age'],
+                                                             user['activity']) for user in users]
+    print(f"Пересчёт норм калорий через NumPy: {(computed - started) * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_services import FakeServices, add_arguments
+from bench_load import SCENARIOS, DEFAULT_MIX, LoadTest, mix_arg, prepare_environment
+
+
+def generate_updates(args):
+    test = LoadTest(None, args, None)
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    plans = []
+    for i in range(args.users):
+        user_id = args.first_user + i
+        rng = random.Random(args.seed * 1000003 + user_id)
+        texts = []
+        for scenario in ['profile'] + rng.choices(names, weights, k=args.steps):
+            texts.extend(SCENARIOS[scenario](rng))
+        plans.append((user_id, texts))
+    # по одному сообщению от каждого пользователя за круг: порядок внутри пользователя сохраняется,
+    # а соседние апдейты принадлежат разным пользователям и обрабатываются параллельно
+    updates = []
+    for step in range(max(len(texts) for _, texts in plans)):
+        for user_id, texts in plans:
+            if step < len(texts):
+                updates.append(test.make_update(user_id, texts[step]))
+    return updates
+
+
+async def run_polling(bot_module, services, updates):
+    await bot_module.on_startup(bot_module.app)
+    try:
+        await bot_module.warm_up_task
+        processed, failed = bot_module.update_queue.processed, bot_module.update_queue.failed
+        started = time.perf_counter()
+        services.push_updates(updates)
+        while bot_module.update_queue.processed + bot_module.update_queue.failed - processed - failed < len(updates):
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        return {'sent': len(updates), 'elapsed': elapsed, 'updates_per_second': len(updates) / elapsed,
+                'processed': bot_module.update_queue.processed - processed,
+                'failed': bot_module.update_queue.failed - failed, 'polling': bot_module.polling_source.stats()}
+    finally:
+        await bot_module.on_shutdown(bot_module.app)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пропускная способность бота при воспроизведении записанных "
+                                                 "обновлений (replay) или через long polling")
+    parser.add_argument('--source', choices=('replay', 'polling'), default='replay')
+    parser.add_argument('--input', nargs='+', metavar='FILE',
+                        help="готовые файлы JSONL с обновлениями, иначе обновления генерируются")
+    parser.add_argument('--output', help="сохранить сгенерированные обновления в JSONL")
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--mix', type=mix_arg, default=mix_arg(DEFAULT_MIX),
+                        help=f"веса сценариев (по умолчанию {DEFAULT_MIX})")
+    parser.add_argument('--first-user', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--send-limits', action='store_true',
+                        help="оставить лимиты отправки SEND_* из конфигурации (по умолчанию сняты)")
+    parser.add_argument('--json', help="сохранить результаты в JSON")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    services = FakeServices(dict(args.latency), args.jitter, args.error_rate)
+    services.start_in_thread()
+    with tempfile.TemporaryDirectory() as data_dir:
+        paths = args.input
+        if not paths:
+            paths = [args.output or os.path.join(data_dir, 'updates.jsonl')]
+            with open(paths[0], "w", encoding='utf-8') as f:
+                for update in generate_updates(args):
+                    f.write(json.dumps(update, ensure_ascii=False) + "\n")
+        prepare_environment(args, services, data_dir)
+        os.environ.update({'UPDATE_SOURCE': args.source, 'POLLING_TIMEOUT': '1'})
+        import logging
+        import bot as bot_module
+        bot_module.setup_handlers(bot_module.dp)
+        logging.getLogger().setLevel(logging.WARNING)
+        LoadTest(bot_module, args, services).route_translation()
+        try:
+            if args.source == 'replay':
+                result = asyncio.run(bot_module.run_replay(paths))
+            else:
+                from update_sources import read_updates
+                result = asyncio.run(run_polling(bot_module, services, list(read_updates(paths))))
+        finally:
+            services.stop_thread()
+    result['upstream_calls'] = dict(services.calls)
+    print(f"{result['sent']} апдейтов за {result['elapsed']:.2f} с: {result['updates_per_second']:.1f} апдейтов/с, "
+          f"обработано {result['processed']}, ошибок в хендлерах {result['failed']}")
+    print("Запросы к заглушкам: " + ", ".join(f"{name} {count}" for name, count in sorted(services.calls.items())))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
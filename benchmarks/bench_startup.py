@@ -0,0 +1,65 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DUMMY_ENV = {
+    "API_TOKEN": "123456:bench",
+    "OPENWEATHER_API_KEY": "bench",
+    "NUTRITIONIX_API_KEY": "bench",
+    "NUTRITIONIX_APP_ID": "bench"
+}
+
+
+def run_import(env):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import bot"], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - started
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative_us), int(self_us), name[1:].rstrip()))
+    return elapsed, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время холодного импорта bot.py")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--budget', type=float, default=0.0, help="Порог в секундах, превышение даёт код 1")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    # всё, что bot.py открывает при импорте, создаётся во временном каталоге, а не в data/ репозитория
+    env = dict(os.environ, **{key: os.environ.get(key, value) for key, value in DUMMY_ENV.items()},
+               STORAGE_BACKEND="memory", NUTRITION_CACHE_PATH=os.path.join(workdir, "nutrition_cache.sqlite3"),
+               INTAKE_LOG_PATH=os.path.join(workdir, "intake_log.sqlite3"),
+               SCHEDULE_PATH=os.path.join(workdir, "schedules.sqlite3"),
+               STORAGE_PATH=os.path.join(workdir, "users.sqlite3"), FSM_STORAGE_PATH=os.path.join(workdir, "fsm.sqlite3"))
+    timings = []
+    modules = []
+    for _ in range(args.runs):
+        elapsed, modules = run_import(env)
+        timings.append(elapsed)
+    best = min(timings)
+    print(f"Импорт bot.py: лучший {best * 1000:.0f} мс, все запуски: "
+          f"{', '.join(f'{t * 1000:.0f}' for t in timings)} мс")
+    print("\nСамые тяжёлые прямые импорты bot.py (кумулятивно):")
+    top_level = [m for m in modules if m[2].startswith("  ") and not m[2].startswith("   ")]
+    for cumulative_us, self_us, name in sorted(top_level, reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:9.1f} мс  {name.strip()}")
+    for heavy in ("matplotlib", "googletrans", "PIL"):
+        if any(name.strip() == heavy for _, _, name in modules):
+            print(f"\nВнимание: {heavy} импортируется при старте")
+    if args.budget and best > args.budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import argparse
+import asyncio
+import random
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from aiohttp import web
+
+SERVICES = ('telegram', 'openweather', 'nutritionix', 'openfoodfacts', 'translate')
+ENV_NAMES = {
+    'telegram': 'TELEGRAM_API_URL',
+    'openweather': 'OPENWEATHER_URL',
+    'nutritionix': 'NUTRITIONIX_URL',
+    'openfoodfacts': 'OPENFOODFACTS_URL'
+}
+
+
+def stable_hash(text):
+    return zlib.crc32(text.lower().encode())
+
+
+class FakeServices:
+    def __init__(self, latency=None, jitter=0.2, error_rate=0.0, host="127.0.0.1"):
+        self.latency = latency or {}
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.host = host
+        self.calls = Counter()
+        self.errors = Counter()
+        self.urls = {}
+        self._message_id = 0
+        self._updates = deque()
+        self._updates_ready = None
+        self._runners = []
+        self._loop = None
+        self._thread = None
+
+    async def _delay(self, service):
+        self.calls[service] += 1
+        latency = self.latency.get(service, 0)
+        if latency:
+            await asyncio.sleep(latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+        if service != 'telegram' and self.error_rate and random.random() < self.error_rate:
+            self.errors[service] += 1
+            raise web.HTTPServiceUnavailable()
+
+    async def telegram(self, request):
+        await self._delay('telegram')
+        method = request.match_info['method'].lower()
+        data = await request.post()
+        if method == 'getme':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'bench'}
+        elif method == 'getupdates':
+            result = await self._get_updates(int(data.get('offset') or 0), int(data.get('limit') or 100),
+                                             float(data.get('timeout') or 0))
+        elif method.startswith('send') or method.startswith('edit'):
+            self._message_id += 1
+            result = {
+                'message_id': self._message_id,
+                'date': int(time.time()),
+                'chat': {'id': int(data.get('chat_id', 0)), 'type': 'private'}
+            }
+            if method == 'sendphoto':
+                result['photo'] = [{'file_id': f"photo-{self._message_id}",
+                                    'file_unique_id': f"unique-{self._message_id}", 'width': 800, 'height': 400}]
+            elif 'text' in data:
+                result['text'] = data['text']
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    async def _get_updates(self, offset, limit, timeout):
+        while self._updates and self._updates[0]['update_id'] < offset:
+            self._updates.popleft()
+        if not self._updates and timeout:
+            self._updates_ready.clear()
+            try:
+                await asyncio.wait_for(self._updates_ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return [self._updates[i] for i in range(min(limit, len(self._updates)))]
+
+    def _push_updates(self, updates):
+        self._updates.extend(updates)
+        self._updates_ready.set()
+
+    def push_updates(self, updates):
+        # очередь getUpdates живёт в цикле заглушек, из другого потока кладём через call_soon_threadsafe
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._push_updates, list(updates))
+        else:
+            self._push_updates(list(updates))
+
+    def pending_updates(self):
+        return len(self._updates)
+
+    async def weather(self, request):
+        await self._delay('openweather')
+        city = request.query.get('q', '')
+        return web.json_response({'id': stable_hash(city) % 1000000, 'name': city,
+                                  'main': {'temp': stable_hash(city) % 35}})
+
+    async def weather_group(self, request):
+        await self._delay('openweather')
+        ids = [int(city_id) for city_id in request.query.get('id', '').split(',') if city_id]
+        return web.json_response({'cnt': len(ids), 'list': [{'id': city_id, 'main': {'temp': city_id % 35}}
+                                                            for city_id in ids]})
+
+    async def nutrients(self, request):
+        await self._delay('nutritionix')
+        foods = []
+        for query in (await request.json()).get('query', '').split(','):
+            name = query.strip().removeprefix('100 g ')
+            foods.append({'food_name': name, 'serving_weight_grams': 100, 'nf_calories': 50 + stable_hash(name) % 300})
+        return web.json_response({'foods': foods})
+
+    async def instant(self, request):
+        await self._delay('nutritionix')
+        return web.json_response({'common': [{'food_name': f"low calorie item {i}", 'nf_calories': i * 7 % 80,
+                                              'serving_qty': 1, 'serving_unit': 'cup'} for i in range(20)]})
+
+    async def openfoodfacts(self, request):
+        await self._delay('openfoodfacts')
+        terms = request.query.get('search_terms', '')
+        return web.json_response({'products': [{'product_name': terms,
+                                                'nutriments': {'energy-kcal_100g': stable_hash(terms) % 400}}]})
+
+    async def translate(self, request):
+        await self._delay('translate')
+        text = request.query.get('q', '')
+        return web.json_response({'text': f"food {stable_hash(text) % 10000}"})
+
+    def _apps(self):
+        telegram = web.Application()
+        telegram.router.add_post("/bot{token}/{method}", self.telegram)
+        openweather = web.Application()
+        openweather.router.add_get("/weather", self.weather)
+        openweather.router.add_get("/group", self.weather_group)
+        nutritionix = web.Application()
+        nutritionix.router.add_post("/natural/nutrients", self.nutrients)
+        nutritionix.router.add_get("/search/instant/", self.instant)
+        openfoodfacts = web.Application()
+        openfoodfacts.router.add_get("/cgi/search.pl", self.openfoodfacts)
+        translate = web.Application()
+        translate.router.add_get("/translate", self.translate)
+        return dict(zip(SERVICES, (telegram, openweather, nutritionix, openfoodfacts, translate)))
+
+    async def start(self):
+        self._updates_ready = asyncio.Event()
+        for service, app in self._apps().items():
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, self.host, 0).start()
+            self._runners.append(runner)
+            self.urls[service] = f"http://{self.host}:{runner.addresses[0][1]}"
+
+    async def stop(self):
+        for runner in self._runners:
+            await runner.cleanup()
+        self._runners = []
+
+    def start_in_thread(self):
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="fake-services", daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def stop_thread(self):
+        if self._thread is not None:
+            asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def env(self):
+        return {name: self.urls[service] for service, name in ENV_NAMES.items()}
+
+
+def latency_arg(value):
+    service, _, ms = value.partition('=')
+    if service not in SERVICES:
+        raise argparse.ArgumentTypeError(f"неизвестный сервис: {service}")
+    try:
+        return service, float(ms) / 1000
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"некорректная задержка: {value}")
+
+
+def add_arguments(parser):
+    parser.add_argument('--latency', type=latency_arg, action='append', default=[], metavar='СЕРВИС=МС',
+                        help=f"задержка ответа фейкового сервиса ({', '.join(SERVICES)}), можно повторять")
+    parser.add_argument('--jitter', type=float, default=0.2, help="разброс задержки, доля от значения")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="доля ответов 503 от внешних API")
+
+
+async def serve(args):
+    services = FakeServices(dict(args.latency), args.jitter, args.error_rate)
+    await services.start()
+    for name, url in services.env().items():
+        print(f"export {name}={url}")
+    print(f"# переводчик: {services.urls['translate']}/translate?q=...", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await services.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальные заглушки Bot API, OpenWeatherMap, Nutritionix, "
+                                                 "OpenFoodFacts и переводчика")
+    add_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
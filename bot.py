@@ -1,55 +1,342 @@
-import random
+import re
+import hmac
+import time
+import asyncio
 import logging
-import requests
-import matplotlib
-import matplotlib.pyplot as plt
-import io
+import threading
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from aiogram import Bot, Dispatcher, Router, types
 from aiogram.enums import ParseMode
 from aiogram.filters import Command
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.storage.memory import MemoryStorage
-from googletrans import Translator
-from aiohttp import web
-from config import API_TOKEN, OPENWEATHER_API_KEY, NUTRITIONIX_API_KEY, NUTRITIONIX_APP_ID
+from aiohttp import web, ClientError
+from config import API_TOKEN, OPENWEATHER_API_KEY, NUTRITIONIX_API_KEY, NUTRITIONIX_APP_ID, WEATHER_CACHE_TTL, \
+    WEATHER_CACHE_SIZE, NUTRITION_CACHE_PATH, NUTRITION_CACHE_SIZE, FOOD_INDEX_PATH, \
+    STORAGE_BACKEND, STORAGE_PATH, REDIS_URL, USER_CACHE_SIZE, STORAGE_FLUSH_INTERVAL, STORAGE_BATCH_SIZE, \
+    WEB_WORKERS, INTERNAL_PORT_BASE, WORKER_DRAIN_TIMEOUT, UPDATE_CONSUMERS, UPDATE_QUEUE_SIZE, OVERLOAD_POLICY, \
+    UPDATE_DEDUP_SIZE, CHART_CACHE_SIZE, CHART_WORKERS, CHART_EXECUTOR, \
+    CHART_BACKEND, INTAKE_LOG_PATH, HISTORY_DAYS, DEFAULT_TIMEZONE, \
+    SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST, SEND_WORKERS, SCHEDULE_PATH, SCHEDULER_BATCH_SIZE, \
+    SCHEDULER_CONCURRENCY, REMINDER_INTERVAL_HOURS, REMINDER_START_HOUR, REMINDER_END_HOUR, SUMMARY_HOUR, \
+    REMINDER_GRACE, WEATHER_GROUP_SIZE, GOAL_REFRESH_INTERVAL, PROFILER_TOKEN, TELEGRAM_API_URL, OPENWEATHER_URL, \
+    NUTRITIONIX_URL, OPENFOODFACTS_URL, TRANSLATE_TIMEOUT, TRANSLATE_WORKERS, RECOMMENDATION_MAX_CALORIES, \
+    RECOMMENDATION_QUERIES, RECOMMENDATION_REFRESH_INTERVAL, USER_LOCK_SHARDS, UPDATE_SOURCE, WEBHOOK_URL, \
+    POLLING_TIMEOUT, POLLING_LIMIT, UPDATE_RECORD_PATH, FSM_STORAGE_PATH, INTERNAL_TOKEN
 from states import ProfileSetup
+from http_client import start_http_session, close_http_session, get_session, get_json, post_json
+from cache import TTLCache
+from nutrition_cache import NutritionStore, normalize_query
+from food_db import load_index
+from translation import load_dictionary
+from workouts import load_catalog, calculate_workout_calories
+from recommendations import RecommendationPool, local_candidates
+from storage import UserStore, create_backend
+from fsm_storage import create_fsm_storage
+from profiles import create_profile, calculate_water_goals
+from update_queue import UpdateQueue, OVERLOADED
+from update_sources import PollingSource, ReplaySource, UpdateRecorder, SOURCES
+from charts import ChartRenderer, chart_key, preload_renderer
+from sender import OutboundSender
+from intake_log import IntakeLog, roll_over, carry_history, history
+from scheduler import Scheduler, next_local_time, spread_offset
+from datetime import datetime
+from metrics import Gauge, HandlerTimingMiddleware, monitor_event_loop, render, upstream_timer
+from profiler import profile_event_loop
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from workers import update_user_id, worker_for_user, internal_port, internal_socket, run_master, INTERNAL_HOST
 
 router = Router()
-translator = Translator()
+translator = None
 
 logging.basicConfig(level=logging.INFO)
-matplotlib.use('Agg')
-bot = Bot(token=API_TOKEN)
-dp = Dispatcher(storage=MemoryStorage())
-WEBHOOK_URL = f"https://hse-apy-tg-bot.onrender.com/webhook"
-
-users = {}
+if TELEGRAM_API_URL:
+    bot = Bot(token=API_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)))
+else:
+    bot = Bot(token=API_TOKEN)
+outbound = OutboundSender(global_rate=SEND_GLOBAL_RATE, chat_rate=SEND_CHAT_RATE, chat_burst=SEND_CHAT_BURST,
+                          workers=SEND_WORKERS)
+bot.session.middleware(outbound)
+dp = Dispatcher(storage=create_fsm_storage(STORAGE_BACKEND, path=FSM_STORAGE_PATH, url=REDIS_URL))
+WORKER_INDEX = 0
+WORKER_COUNT = 1
+REMINDER_KINDS = ('water', 'summary')
+
+user_store = UserStore(create_backend(STORAGE_BACKEND, path=STORAGE_PATH, url=REDIS_URL),
+                       cache_size=USER_CACHE_SIZE, flush_interval=STORAGE_FLUSH_INTERVAL,
+                       batch_size=STORAGE_BATCH_SIZE, lock_shards=USER_LOCK_SHARDS)
+weather_cache = TTLCache(maxsize=WEATHER_CACHE_SIZE, ttl=WEATHER_CACHE_TTL)
+city_ids = {}
+goal_refresh_stats = {}
+nutrition_store = NutritionStore(NUTRITION_CACHE_PATH, NUTRITION_CACHE_SIZE)
+intake_log = IntakeLog(INTAKE_LOG_PATH, flush_interval=STORAGE_FLUSH_INTERVAL)
+
+
+def create_scheduler(path):
+    return Scheduler(path, lambda *args: send_reminder(*args), lambda *args: plan_reminder(*args),
+                     batch_size=SCHEDULER_BATCH_SIZE, concurrency=SCHEDULER_CONCURRENCY,
+                     owns=lambda user_id: worker_for_user(user_id, WORKER_COUNT) == WORKER_INDEX)
+
+
+scheduler = create_scheduler(SCHEDULE_PATH)
+food_index = None
+food_dictionary = None
+workout_catalog = None
+translate_executor = ThreadPoolExecutor(max_workers=TRANSLATE_WORKERS, thread_name_prefix="translate")
+warm_up_task = None
+goal_refresh_task = None
+recommendation_task = None
+recommendation_pool = RecommendationPool(max_calories=RECOMMENDATION_MAX_CALORIES)
+loop_monitor_task = None
+polling_source = None
+internal_runner = None
+polling_task = None
+update_recorder = None
+_lazy_lock = threading.Lock()
+update_queue = UpdateQueue(lambda update: dp.feed_update(bot, update), consumers=UPDATE_CONSUMERS,
+                           maxsize=UPDATE_QUEUE_SIZE, dedup_size=UPDATE_DEDUP_SIZE)
+chart_renderer = ChartRenderer(cache_size=CHART_CACHE_SIZE, workers=CHART_WORKERS, executor=CHART_EXECUTOR,
+                               backend=CHART_BACKEND)
 
 
 async def on_startup(app):
-    await bot.set_webhook(WEBHOOK_URL)
-    logging.info(f"Webhook установлен на {WEBHOOK_URL}")
+    global warm_up_task, goal_refresh_task, loop_monitor_task, recommendation_task, polling_source, polling_task, \
+        update_recorder, internal_runner
+    await start_http_session()
+    if WORKER_COUNT > 1:
+        internal_runner = web.AppRunner(internal_app, access_log=None)
+        await internal_runner.setup()
+        await web.SockSite(internal_runner, internal_socket(INTERNAL_PORT_BASE, WORKER_INDEX)).start()
+    await user_store.start()
+    await intake_log.start()
+    update_queue.start()
+    outbound.start()
+    warm_up_task = asyncio.create_task(warm_up())
+    loop_monitor_task = asyncio.create_task(monitor_event_loop())
+    if UPDATE_SOURCE == "replay":
+        return
+    await scheduler.start()
+    if GOAL_REFRESH_INTERVAL > 0:
+        goal_refresh_task = asyncio.create_task(goal_refresh_loop())
+    recommendation_task = asyncio.create_task(recommendation_refresh_loop())
+    if UPDATE_RECORD_PATH and UPDATE_SOURCE != "replay":
+        update_recorder = UpdateRecorder(UPDATE_RECORD_PATH)
+    if UPDATE_SOURCE == "polling":
+        polling_source = PollingSource(bot, update_queue, timeout=POLLING_TIMEOUT, limit=POLLING_LIMIT,
+                                       allowed_updates=dp.resolve_used_update_types(), recorder=update_recorder)
+        polling_task = asyncio.create_task(polling_source.run())
+    elif UPDATE_SOURCE == "webhook" and WORKER_INDEX == 0:
+        await bot.set_webhook(WEBHOOK_URL)
+        logging.info(f"Webhook установлен на {WEBHOOK_URL}")
 
 
 async def on_shutdown(app):
-    logging.info("Удаление Webhook...")
-    await bot.delete_webhook()
+    for task in (polling_task, warm_up_task, goal_refresh_task, loop_monitor_task, recommendation_task):
+        if task is not None:
+            task.cancel()
+    if internal_runner is not None:
+        await internal_runner.cleanup()
+    # напоминания перестают срабатывать до того, как очередь отправки дренируется и сессия закрывается,
+    # иначе сработавшее в этот момент напоминание уходило бы в закрытую сессию; изменения расписания
+    # из дорабатывающих хендлеров сохраняются ниже, в scheduler.close()
+    await scheduler.stop()
+    await update_queue.stop(WORKER_DRAIN_TIMEOUT)
+    await outbound.stop(WORKER_DRAIN_TIMEOUT)
+    if UPDATE_SOURCE == "webhook" and WORKER_INDEX == 0 and WORKER_COUNT == 1:
+        logging.info("Удаление Webhook...")
+        await bot.delete_webhook()
     await bot.session.close()
+    await close_http_session()
+    await user_store.close()
+    await dp.storage.close()
+    await intake_log.close()
+    await scheduler.close()
+    nutrition_store.close()
+    chart_renderer.close()
+    translate_executor.shutdown(wait=False, cancel_futures=True)
+    if food_index is not None:
+        food_index.close()
+    if workout_catalog is not None:
+        workout_catalog.close()
+    if update_recorder is not None:
+        update_recorder.close()
+
+
+async def warm_up():
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(get_food_index)
+        await asyncio.to_thread(get_food_dictionary)
+        await asyncio.to_thread(get_workout_catalog)
+        await asyncio.to_thread(get_translator)
+        await asyncio.to_thread(preload_renderer, CHART_BACKEND)
+    except Exception:
+        logging.exception("Ошибка при фоновом прогреве")
+        return
+    logging.info(f"Фоновый прогрев завершён за {time.perf_counter() - started:.2f} с")
+
+
+async def read_update_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
 
 
 async def handle_webhook(request):
-    body = await request.json()
-    update = types.Update(**body)
-    await dp.feed_update(bot, update)
+    body = await read_update_body(request)
+    if body is None:
+        logging.warning("Получено некорректное обновление")
+        return web.Response(status=400)
+    owner = worker_for_user(update_user_id(body), WORKER_COUNT)
+    if owner != WORKER_INDEX:
+        if not INTERNAL_TOKEN:
+            logging.error("INTERNAL_TOKEN не задан, обновление нельзя передать другому воркеру")
+            return web.Response(status=503)
+        url = f"http://{INTERNAL_HOST}:{internal_port(INTERNAL_PORT_BASE, owner)}/internal/webhook"
+        headers = {'X-Internal-Token': INTERNAL_TOKEN}
+        try:
+            async with get_session().post(url, json=body, headers=headers) as response:
+                return web.Response(status=response.status)
+        except ClientError as e:
+            logging.warning(f"Не удалось передать обновление воркеру {owner}: {e!r}")
+            return web.Response(status=503)
+    return enqueue_update(body)
+
+
+async def handle_internal_webhook(request):
+    token = request.headers.get('X-Internal-Token', '')
+    if not INTERNAL_TOKEN or not hmac.compare_digest(token.encode(), INTERNAL_TOKEN.encode()):
+        return web.Response(status=403)
+    body = await read_update_body(request)
+    if body is None:
+        return web.Response(status=400)
+    return enqueue_update(body)
+
+
+def enqueue_update(body):
+    try:
+        update = types.Update(**body)
+    except (TypeError, ValueError):
+        logging.warning("Получено некорректное обновление")
+        return web.Response(status=400)
+    if update_recorder is not None:
+        update_recorder.write(body)
+    result = update_queue.submit(update, key=update_user_id(body))
+    if result == OVERLOADED:
+        logging.warning(f"Очередь обновлений переполнена, обновление {update.update_id} "
+                        f"{'отклонено' if OVERLOAD_POLICY == 'reject' else 'отброшено'}")
+        if OVERLOAD_POLICY == "reject":
+            return web.Response(status=429, headers={'Retry-After': '1'})
     return web.Response()
 
 
+async def handle_cache_stats(request):
+    return web.json_response({'weather': weather_cache.stats(), **nutrition_store.stats(),
+                              'charts': chart_renderer.stats(), 'goal_refresh': goal_refresh_stats,
+                              'dictionary': food_dictionary.stats() if food_dictionary is not None else {},
+                              'recommendations': recommendation_pool.stats()})
+
+
+async def handle_queue_stats(request):
+    return web.json_response({**update_queue.stats(), 'outbound': outbound.stats(),
+                              'polling': polling_source.stats() if polling_source is not None else {}})
+
+
+def is_stub_api(url):
+    return bool(url) and "api.telegram.org" not in url
+
+
+async def run_replay(paths):
+    # записанные апдейты содержат настоящие chat id: ответы уходят только в заглушку Bot API,
+    # а профили, журнал и расписание живут во временном каталоге, без напоминаний и фоновых пересчётов
+    global UPDATE_SOURCE, user_store, intake_log, nutrition_store, scheduler
+    if not is_stub_api(TELEGRAM_API_URL):
+        raise RuntimeError("Для replay укажите в TELEGRAM_API_URL адрес заглушки Bot API")
+    UPDATE_SOURCE = "replay"
+    with tempfile.TemporaryDirectory() as data_dir:
+        await user_store.close()
+        await intake_log.close()
+        await scheduler.close()
+        nutrition_store.close()
+        await dp.storage.close()
+        dp.fsm.storage = MemoryStorage()
+        user_store = UserStore(create_backend("memory"), cache_size=USER_CACHE_SIZE,
+                               flush_interval=STORAGE_FLUSH_INTERVAL, batch_size=STORAGE_BATCH_SIZE,
+                               lock_shards=USER_LOCK_SHARDS)
+        intake_log = IntakeLog(os.path.join(data_dir, 'intake_log.sqlite'), flush_interval=STORAGE_FLUSH_INTERVAL)
+        nutrition_store = NutritionStore(os.path.join(data_dir, 'nutrition_cache.sqlite'), NUTRITION_CACHE_SIZE)
+        scheduler = create_scheduler(os.path.join(data_dir, 'schedules.sqlite'))
+        await on_startup(app)
+        try:
+            await warm_up_task
+            return await ReplaySource(paths, update_queue).run()
+        finally:
+            await on_shutdown(app)
+
+
+async def handle_metrics(request):
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8",
+                        headers={'X-Content-Type-Options': 'nosniff'})
+
+
+async def handle_profile(request):
+    if not PROFILER_TOKEN or request.headers.get('X-Profiler-Token') != PROFILER_TOKEN:
+        return web.Response(status=404)
+    try:
+        seconds = min(float(request.query.get('seconds', 10)), 300)
+        interval = max(float(request.query.get('interval', 0.005)), 0.001)
+    except ValueError:
+        return web.Response(status=400)
+    folded = await profile_event_loop(seconds, interval)
+    if folded is None:
+        return web.Response(status=409, text="Профилирование уже запущено")
+    return web.Response(text=folded, content_type="text/plain", charset="utf-8")
+
+
 app = web.Application()
 app.router.add_post("/webhook", handle_webhook)
+app.router.add_get("/cache_stats", handle_cache_stats)
+app.router.add_get("/queue_stats", handle_queue_stats)
+app.router.add_get("/metrics", handle_metrics)
+app.router.add_get("/debug/profile", handle_profile)
 app.on_startup.append(on_startup)
 app.on_shutdown.append(on_shutdown)
+# внутренний маршрут между воркерами слушает только локальный сокет воркера, а не публичный порт
+internal_app = web.Application()
+internal_app.router.add_post("/internal/webhook", handle_internal_webhook)
+
+
+async def serialize_user(handler, event, data):
+    user = data.get('event_from_user')
+    if user is None:
+        return await handler(event, data)
+    async with user_store.lock(user.id):
+        return await handler(event, data)
+
+
+router.message.middleware(HandlerTimingMiddleware())
+router.callback_query.middleware(HandlerTimingMiddleware())
+router.message.middleware(serialize_user)
+router.callback_query.middleware(serialize_user)
+Gauge("bot_cache_hit_ratio", "Доля попаданий в кэш", lambda: {
+    'weather': weather_cache.stats()['hit_ratio'],
+    'translations': nutrition_store.translations.stats()['hit_ratio'],
+    'foods': nutrition_store.foods.stats()['hit_ratio'],
+    'chart_images': chart_renderer.images.stats()['hit_ratio'],
+    'chart_file_ids': chart_renderer.file_ids.stats()['hit_ratio'],
+    'dictionary': food_dictionary.stats()['hit_ratio'] if food_dictionary is not None else 0.0
+}, labelname="cache")
+Gauge("bot_update_queue_depth", "Обновлений в очереди webhook", lambda: update_queue.depth())
+Gauge("bot_updates_dropped", "Обновлений отброшено из-за переполнения", lambda: update_queue.overloaded)
+Gauge("bot_outbound_queue_depth", "Сообщений в очереди отправки", lambda: outbound.stats()['queued'])
+Gauge("bot_scheduled_jobs", "Запланированных напоминаний", lambda: scheduler.stats()['scheduled'])
 
 
 main_menu = InlineKeyboardMarkup(inline_keyboard=[
@@ -63,33 +350,139 @@ main_menu = InlineKeyboardMarkup(inline_keyboard=[
 ])
 
 
-def calculate_water_goal(weight, activity, temperature):
-    base = weight * 30
-    activity_bonus = (activity // 30) * 500
-    weather_bonus = 500 if temperature > 25 else 0
-    return base + activity_bonus + weather_bonus
+FOOD_ITEM_PATTERN = re.compile(r"^(.+?)\s+(\d+(?:\.\d+)?)\s*(?:г|гр|грамм|g|мл|ml)?\.?$", re.IGNORECASE)
+
+
+def parse_food_items(text):
+    items = []
+    for part in re.split(r"[,;\n]", text):
+        part = part.strip()
+        if not part:
+            continue
+        match = FOOD_ITEM_PATTERN.match(part)
+        if match:
+            items.append((match.group(1), float(match.group(2))))
+        else:
+            items.append((part, None))
+    return items
+
+
+WORKOUT_ITEM_PATTERN = re.compile(r"^(.+?)\s+(-?\d+)\s*(?:мин|минут|минуты|минута|min|m)?\.?$", re.IGNORECASE)
+
+
+def parse_workout_items(text):
+    items = []
+    for part in re.split(r"[,;\n]", text):
+        part = part.strip()
+        if not part:
+            continue
+        match = WORKOUT_ITEM_PATTERN.match(part)
+        if match:
+            items.append((match.group(1), int(match.group(2))))
+        else:
+            items.append((part, None))
+    return items
 
 
-def calculate_calorie_goal(weight, height, age, activity):
-    base = 10 * weight + 6.25 * height - 5 * age
-    activity_bonus = (activity // 30) * 50
-    return base + activity_bonus
+def city_key(city):
+    return ' '.join(city.split()).lower()
 
 
-def get_weather(city):
-    url = f'https://api.openweathermap.org/data/2.5/weather?q={city}&appid={OPENWEATHER_API_KEY}&units=metric'
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
+async def get_weather(city):
+    key = city_key(city)
+    return await weather_cache.get_or_fetch(key, lambda: fetch_weather(city))
+
+
+async def fetch_weather(city):
+    url = f'{OPENWEATHER_URL}/weather'
+    params = {'q': city, 'appid': OPENWEATHER_API_KEY, 'units': 'metric'}
+    data = await get_json(url, params=params)
+    if data is not None:
+        if 'id' in data:
+            city_ids[city_key(city)] = data['id']
         return data['main']['temp']
     return None
 
 
-def get_food_info(product_name):
-    url = f"https://world.openfoodfacts.org/cgi/search.pl?action=process&search_terms={product_name}&json=true"
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
+async def fetch_weather_group(ids):
+    url = f'{OPENWEATHER_URL}/group'
+    params = {'id': ','.join(str(city_id) for city_id in ids), 'appid': OPENWEATHER_API_KEY, 'units': 'metric'}
+    data = await get_json(url, params=params)
+    if data is None:
+        return {}
+    return {item['id']: item['main']['temp'] for item in data.get('list', [])}
+
+
+async def get_weather_bulk(cities):
+    temperatures = {}
+    calls = 0
+    known = [(key, city_ids[key]) for key in cities if key in city_ids]
+    for i in range(0, len(known), WEATHER_GROUP_SIZE):
+        chunk = known[i:i + WEATHER_GROUP_SIZE]
+        result = await fetch_weather_group([city_id for _, city_id in chunk])
+        calls += 1
+        for key, city_id in chunk:
+            if city_id in result:
+                temperatures[key] = result[city_id]
+                weather_cache.set(key, result[city_id])
+    missing = [(key, city) for key, city in cities.items() if key not in temperatures]
+    calls += sum(1 for key, _ in missing if weather_cache.get(key) is None)
+    results = await asyncio.gather(*(get_weather(city) for _, city in missing))
+    for (key, _), temperature in zip(missing, results):
+        if temperature is not None:
+            temperatures[key] = temperature
+    return temperatures, calls
+
+
+async def refresh_water_goals():
+    started = time.perf_counter()
+    groups = {}
+    for user_id, user in (await user_store.scan()).items():
+        if user.get('city') and worker_for_user(user_id, WORKER_COUNT) == WORKER_INDEX:
+            groups.setdefault(city_key(user['city']), []).append((user_id, user))
+    temperatures, calls = await get_weather_bulk({key: members[0][1]['city'] for key, members in groups.items()})
+
+    members = [(user_id, user, temperatures[key]) for key, group in groups.items() if key in temperatures
+               for user_id, user in group]
+    users = len(members)
+    updated = 0
+    if members:
+        goals = calculate_water_goals([user['weight'] for _, user, _ in members],
+                                      [user['activity'] for _, user, _ in members],
+                                      [temperature for _, _, temperature in members]).tolist()
+        for (user_id, snapshot, _), water_goal in zip(members, goals):
+            if snapshot['water_goal'] == water_goal:
+                continue
+            # снимок из scan() мог устареть за время запроса погоды: меняем только норму в актуальном профиле
+            async with user_store.lock(user_id):
+                user = await user_store.get(user_id)
+                if user is None or any(user.get(field) != snapshot[field] for field in ('weight', 'activity', 'city')):
+                    continue
+                user['water_goal'] = water_goal
+                user_store.mark_dirty(user_id)
+                updated += 1
+
+    goal_refresh_stats.update(cities=len(groups), refreshed_cities=len(temperatures), upstream_calls=calls,
+                              users=users, updated=updated, duration=time.perf_counter() - started,
+                              finished_at=time.time())
+    logging.info(f"Пересчёт норм воды: {len(groups)} городов, {calls} запросов к OpenWeather, "
+                 f"{updated} из {users} профилей обновлено за {goal_refresh_stats['duration']:.2f} с")
+
+
+async def goal_refresh_loop():
+    while True:
+        await asyncio.sleep(GOAL_REFRESH_INTERVAL)
+        try:
+            await refresh_water_goals()
+        except Exception:
+            logging.exception("Ошибка при пересчёте норм воды")
+
+
+async def get_food_info(product_name):
+    url = f"{OPENFOODFACTS_URL}/cgi/search.pl"
+    params = {'action': 'process', 'search_terms': product_name, 'json': 'true'}
+    data = await get_json(url, params=params)
+    if data is not None:
         products = data.get('products', [])
         if products:
             first_product = products[0]
@@ -100,15 +493,126 @@ def get_food_info(product_name):
     return
 
 
+def get_food_index():
+    global food_index
+    if food_index is None:
+        with _lazy_lock:
+            if food_index is None:
+                food_index = load_index(FOOD_INDEX_PATH)
+    return food_index
+
+
+def get_food_dictionary():
+    global food_dictionary
+    if food_dictionary is None:
+        with _lazy_lock:
+            if food_dictionary is None:
+                food_dictionary = load_dictionary()
+    return food_dictionary
+
+
+def get_workout_catalog():
+    global workout_catalog
+    if workout_catalog is None:
+        with _lazy_lock:
+            if workout_catalog is None:
+                workout_catalog = load_catalog()
+    return workout_catalog
+
+
+def get_translator():
+    global translator
+    if translator is None:
+        with _lazy_lock:
+            if translator is None:
+                from googletrans import Translator
+                translator = Translator()
+    return translator
+
+
+def lookup_foods(product_names):
+    index = get_food_index()
+    return [index.lookup(name) for name in product_names]
+
+
+async def get_nutrition_info(product_name):
+    # поиск по большому индексу занимает миллисекунды, поэтому он идёт в потоке, а не в цикле событий
+    food_info, = await asyncio.to_thread(lookup_foods, [product_name])
+    if food_info:
+        return food_info
+    food_info = await get_nutrition_info_from_nutritionix(product_name)
+    if food_info:
+        return food_info
+    return await get_food_info(product_name)
+
+
 def translate_to_english(text):
-    translation = translator.translate(text, src='ru', dest='en')
+    translation = get_translator().translate(text, src='ru', dest='en')
     return translation.text
 
 
+async def translate_query(text):
+    loop = asyncio.get_running_loop()
+    try:
+        with upstream_timer('translator'):
+            return await asyncio.wait_for(loop.run_in_executor(translate_executor, translate_to_english, text),
+                                          TRANSLATE_TIMEOUT)
+    except Exception as e:
+        logging.warning(f"Не удалось перевести «{text}»: {e!r}")
+        return None
+
+
+async def get_translation(product_name):
+    translated = get_food_dictionary().translate(product_name)
+    if translated:
+        return translated
+    return await nutrition_store.get_translation(product_name, translate_query)
+
+
 async def get_nutrition_info_from_nutritionix(product_name):
-    translated_name = translate_to_english(product_name)
+    translated_name = await get_translation(product_name)
+    if not translated_name:
+        return None
+    return await nutrition_store.get_food(translated_name, lambda name: fetch_nutritionix(f"100 g {name}"))
+
+
+async def get_nutrition_info_many(product_names):
+    results = await asyncio.to_thread(lookup_foods, product_names)
+    missing = [i for i, food_info in enumerate(results) if not food_info]
+    if not missing:
+        return results
+
+    translations = await asyncio.gather(*(get_translation(product_names[i]) for i in missing))
+    translated = {i: normalize_query(name) for i, name in zip(missing, translations) if name}
+    foods = await nutrition_store.get_foods(translated.values(), fetch_nutritionix_many) if translated else {}
+    for i, name in translated.items():
+        results[i] = foods.get(name)
+
+    missing = [i for i in missing if not results[i]]
+    for i, food_info in zip(missing, await asyncio.gather(*(get_food_info(product_names[i]) for i in missing))):
+        results[i] = food_info
+    return results
+
 
-    url = "https://trackapi.nutritionix.com/v2/natural/nutrients"
+async def fetch_nutritionix_many(translated_names):
+    url = f"{NUTRITIONIX_URL}/natural/nutrients"
+    headers = {
+        'x-app-id': NUTRITIONIX_APP_ID,
+        'x-app-key': NUTRITIONIX_API_KEY,
+        'Content-Type': 'application/json'
+    }
+    queries = [f"100 g {name}" for name in translated_names]
+    data = await post_json(url, headers=headers, json={"query": ", ".join(queries)})
+    foods = data.get('foods', []) if data is not None else []
+    if len(foods) == len(translated_names):
+        return {name: {'name': food['food_name'], 'calories': food['nf_calories']}
+                for name, food in zip(translated_names, foods)}
+    # Nutritionix молча пропускает нераспознанные продукты, тогда порядок не сопоставить
+    return dict(zip(translated_names, await asyncio.gather(*(fetch_nutritionix(query) for query in queries))))
+
+
+async def fetch_nutritionix(translated_name):
+    url = f"{NUTRITIONIX_URL}/natural/nutrients"
     headers = {
         'x-app-id': NUTRITIONIX_APP_ID,
         'x-app-key': NUTRITIONIX_API_KEY,
@@ -118,10 +622,9 @@ async def get_nutrition_info_from_nutritionix(product_name):
         "query": translated_name
     }
 
-    response = requests.post(url, headers=headers, json=body)
+    data = await post_json(url, headers=headers, json=body)
 
-    if response.status_code == 200:
-        data = response.json()
+    if data is not None:
         if 'foods' in data:
             food = data['foods'][0]
             product_name = food['food_name']
@@ -153,26 +656,24 @@ async def handle_menu(callback_query: types.CallbackQuery, state: FSMContext):
 
     elif callback_query.data == "log_food":
         await callback_query.message.answer(
-            "Введите название продукта с командой /log_food <название продукта>. (например: /log_food банан)")
+            "Введите название продукта с командой /log_food <название продукта>. (например: /log_food банан) "
+            "Можно записать сразу несколько продуктов с весом: /log_food банан 120, овсянка 60, молоко 200")
 
     elif callback_query.data == "log_workout":
-        await callback_query.message.answer("Введите тип тренировки и время (например: /log_workout бег 30).")
+        await callback_query.message.answer("Введите тип тренировки и время (например: /log_workout бег 30 или /log_workout бег 30, йога 45).")
 
     elif callback_query.data == "check_progress":
-        if user_id in users:
-            user = users[user_id]
+        user = await get_user(user_id)
+        if user is not None:
             water_progress = f"Выпито: {user['logged_water']} мл из {user['water_goal']} мл."
             calorie_progress = (f"Потреблено: {user['logged_calories']} ккал из {user['calorie_goal']} ккал.\n"
                                 f"Сожжено: {user['burned_calories']} ккал.")
-            progress_chart = create_progress_chart(user)
-            progress_chart_bytes = progress_chart.getvalue()
-            photo = BufferedInputFile(progress_chart_bytes, filename="progress_chart.png")
             await callback_query.message.answer(f"📊 Прогресс:\n\n{water_progress}\n\n{calorie_progress}")
-            await callback_query.message.answer_photo(photo=photo)
+            await send_progress_chart(callback_query.message, user)
         else:
             await callback_query.message.answer("Сначала настройте профиль с помощью команды /set_profile.")
     elif callback_query.data == "get_recommendations":
-        await get_recommendations(callback_query.message)
+        await get_recommendations(callback_query.message, user_id)
     elif callback_query.data == "show_commands":
         commands = (
             "/start - Приветствие и кнопки\n"
@@ -184,6 +685,9 @@ async def handle_menu(callback_query: types.CallbackQuery, state: FSMContext):
             "/check_progress - Посмотреть прогресс\n"
             "/get_recommendations - Получить рекомендации\n"
             "/preset_profile - Заполненный профиль\n"
+            "/history - История за 7 или 30 дней\n"
+            "/set_timezone - Часовой пояс для смены дня\n"
+            "/reminders - Включить или выключить напоминания (on/off)\n"
         )
         await callback_query.message.answer(commands)
 
@@ -200,6 +704,9 @@ async def show_commands(message: Message):
         "/check_progress - Посмотреть прогресс\n"
         "/get_recommendations - Получить рекомендации\n"
         "/preset_profile - Заполненный профиль\n"
+        "/history - История за 7 или 30 дней\n"
+        "/set_timezone - Часовой пояс для смены дня\n"
+        "/reminders - Включить или выключить напоминания (on/off)\n"
     )
     await message.reply(commands)
 
@@ -250,35 +757,31 @@ async def process_activity(message: Message, state: FSMContext):
         await message.reply("Пожалуйста, введите корректное число для активности.")
 
 
+async def save_profile(user_id, data, temperature):
+    user = carry_history(await get_user(user_id),
+                         create_profile(data['weight'], data['height'], data['age'], data['activity'], data['city'],
+                                        temperature))
+    user_store.set(user_id, user)
+    schedule_reminders(user_id, user)
+    return user
+
+
 @router.message(ProfileSetup.city)
 async def process_city(message: Message, state: FSMContext):
     data = await state.get_data()
     data['city'] = message.text
     user_id = message.from_user.id
 
-    temperature = get_weather(data['city'])
+    temperature = await get_weather(data['city'])
     if temperature is None:
         await message.reply("Не удалось получить данные о погоде. Попробуйте снова позже.")
         await state.clear()
         return
 
-    water_goal = calculate_water_goal(data['weight'], data['activity'], temperature)
-    calorie_goal = calculate_calorie_goal(data['weight'], data['height'], data['age'], data['activity'])
-
-    users[user_id] = {
-        "weight": data['weight'],
-        "height": data['height'],
-        "age": data['age'],
-        "activity": data['activity'],
-        "city": data['city'],
-        "water_goal": water_goal,
-        "calorie_goal": calorie_goal,
-        "logged_water": 0,
-        "logged_calories": 0,
-        "burned_calories": 0
-    }
+    user = await save_profile(user_id, data, temperature)
 
-    await message.reply(f"Профиль сохранён!\n\nНорма воды: {water_goal} мл\nНорма калорий: {calorie_goal} ккал",
+    await message.reply(f"Профиль сохранён!\n\nНорма воды: {user['water_goal']} мл\n"
+                        f"Норма калорий: {user['calorie_goal']} ккал",
                         parse_mode=ParseMode.HTML)
     await state.clear()
 
@@ -293,9 +796,11 @@ async def log_water(message: Message):
 
         amount = int(command_parts[1])
         user_id = message.from_user.id
-        if user_id in users:
-            users[user_id]['logged_water'] += amount
-            water_left = users[user_id]['water_goal'] - users[user_id]['logged_water']
+        user = await get_user(user_id)
+        if user is not None:
+            user = await user_store.increment(user_id, logged_water=amount)
+            intake_log.append(user_id, 'water', amount)
+            water_left = user['water_goal'] - user['logged_water']
             await message.reply(f"Записано: {amount} мл воды. Осталось: {max(0, water_left)} мл.")
         else:
             await message.reply("Сначала настройте профиль с помощью команды /set_profile.")
@@ -306,11 +811,15 @@ async def log_water(message: Message):
 @router.message(Command("log_food"))
 async def log_food(message: Message, state: FSMContext):
     command_parts = message.text.split(maxsplit=1)
-    if len(command_parts) < 2:
+    items = parse_food_items(command_parts[1]) if len(command_parts) > 1 else []
+    if not items:
         await message.reply("Пожалуйста, укажите название продукта. (например: /log_food банан)")
         return
-    product_name = command_parts[1]
-    food_info = await get_nutrition_info_from_nutritionix(product_name)
+    if len(items) > 1 or items[0][1] is not None:
+        await log_meal(message, items)
+        return
+    product_name = items[0][0]
+    food_info = await get_nutrition_info(product_name)
 
     if food_info:
         calories_per_100g = food_info['calories']
@@ -321,6 +830,44 @@ async def log_food(message: Message, state: FSMContext):
         await message.reply("Не удалось найти информацию о продукте. Попробуйте другое название.")
 
 
+async def log_meal(message, items):
+    unknown_quantity = [name for name, grams in items if grams is None]
+    if unknown_quantity:
+        await message.reply(f"Укажите количество в граммах для: {', '.join(unknown_quantity)}. "
+                            f"(например: /log_food банан 120, овсянка 60)")
+        return
+
+    food_infos = await get_nutrition_info_many([name for name, _ in items])
+
+    user_id = message.from_user.id
+    user = await get_user(user_id)
+    if user is None:
+        await message.reply("Сначала настройте профиль с помощью команды /set_profile.")
+        return
+
+    lines = []
+    not_found = []
+    total_calories = 0
+    for (name, grams), food_info in zip(items, food_infos):
+        if not food_info:
+            not_found.append(name)
+            continue
+        consumed_calories = (food_info['calories'] * grams) / 100
+        total_calories += consumed_calories
+        intake_log.append(user_id, 'food', grams, consumed_calories, food_info['name'])
+        lines.append(f"{food_info['name']} — {grams:g} г: {consumed_calories:.2f} ккал")
+    if lines:
+        user = await user_store.increment(user_id, logged_calories=total_calories)
+
+    response = ""
+    if lines:
+        response = (f"Записано: {total_calories:.2f} ккал.\n" + "\n".join(lines) +
+                    f"\n\nОбщая сумма потребленных калорий: {user['logged_calories']:.2f} ккал.")
+    if not_found:
+        response += f"\n\nНе удалось найти: {', '.join(not_found)}."
+    await message.reply(response.strip())
+
+
 @router.message(ProfileSetup.food_quantity)
 async def process_food_quantity(message: Message, state: FSMContext):
     try:
@@ -331,11 +878,13 @@ async def process_food_quantity(message: Message, state: FSMContext):
         consumed_calories = (calories_per_100g * grams) / 100
 
         user_id = message.from_user.id
-        if user_id in users:
-            users[user_id]['logged_calories'] += consumed_calories
+        user = await get_user(user_id)
+        if user is not None:
+            user = await user_store.increment(user_id, logged_calories=consumed_calories)
+            intake_log.append(user_id, 'food', grams, consumed_calories, data.get('product_name'))
             await message.reply(
                 f"Записано: {consumed_calories:.2f} ккал. "
-                f"Общая сумма потребленных калорий: {users[user_id]['logged_calories']:.2f} ккал."
+                f"Общая сумма потребленных калорий: {user['logged_calories']:.2f} ккал."
             )
         else:
             await message.reply("Сначала настройте профиль с помощью команды /set_profile.")
@@ -348,61 +897,69 @@ async def process_food_quantity(message: Message, state: FSMContext):
 
 @router.message(Command("log_workout"))
 async def log_workout(message: Message):
-    try:
-        command_parts = message.text.split()
-        if len(command_parts) != 3:
-            await message.reply("Пожалуйста, укажите тип тренировки и время (например: /log_workout бег 30).")
-            return
-
-        workout_type = command_parts[1].lower()
-        workout_time = int(command_parts[2])
-
-        if workout_time <= 0:
-            await message.reply("Время тренировки должно быть больше нуля.")
-            return
+    command_parts = message.text.split(maxsplit=1)
+    items = parse_workout_items(command_parts[1]) if len(command_parts) > 1 else []
+    if not items or any(minutes is None for _, minutes in items):
+        await message.reply("Пожалуйста, укажите тип тренировки и время (например: /log_workout бег 30 "
+                            "или /log_workout бег 30, йога 45).")
+        return
+    if any(minutes <= 0 for _, minutes in items):
+        await message.reply("Время тренировки должно быть больше нуля.")
+        return
 
-        workout_calories = 0
-        water_needed = 0
-        if workout_type == "бег":
-            workout_calories = workout_time * 10
-            water_needed = (workout_time // 30) * 200
-        elif workout_type == "плавание":
-            workout_calories = workout_time * 8
-            water_needed = (workout_time // 30) * 200
-        elif workout_type == "велоспорт":
-            workout_calories = workout_time * 7
-            water_needed = (workout_time // 30) * 200
-        else:
-            await message.reply("Неизвестный тип тренировки. Попробуйте 'бег', 'плавание' или 'велоспорт'.")
-            return
+    user_id = message.from_user.id
+    user = await get_user(user_id)
+    if user is None:
+        await message.reply("Сначала настройте профиль с помощью команды /set_profile.")
+        return
 
-        user_id = message.from_user.id
-        if user_id in users:
-            users[user_id]['burned_calories'] += workout_calories
-            users[user_id]['logged_water'] += water_needed
-            remaining_water = users[user_id]['water_goal'] - users[user_id]['logged_water']
-            await message.reply(f"🏃‍♂️ Тренировка ({workout_type}) на {workout_time} минут — {workout_calories} ккал.\n"
-                                f"Дополнительно: выпейте {water_needed} мл воды.\n"
-                                f"Осталось: {max(0, remaining_water)} мл воды.")
-        else:
-            await message.reply("Сначала настройте профиль с помощью команды /set_profile.")
+    catalog = get_workout_catalog()
+    workouts = []
+    unknown = []
+    for workout_type, workout_time in items:
+        workout = catalog.lookup(workout_type)
+        if workout is None:
+            unknown.append(workout_type)
+            continue
+        workout_calories = round(calculate_workout_calories(workout['met'], user['weight'], workout_time))
+        water_needed = (workout_time // 30) * 200
+        workouts.append((workout['name'], workout_time, workout_calories, water_needed))
+    if unknown:
+        await message.reply(f"Неизвестный тип тренировки: {', '.join(unknown)}. "
+                            f"Попробуйте, например, 'бег', 'плавание', 'велоспорт' или 'йога'.")
+        return
 
-    except ValueError:
-        await message.reply("Пожалуйста, введите корректное количество минут для тренировки.")
+    burned = sum(workout[2] for workout in workouts)
+    water = sum(workout[3] for workout in workouts)
+    user = await user_store.increment(user_id, burned_calories=burned, logged_water=water)
+    for workout_type, workout_time, workout_calories, _ in workouts:
+        intake_log.append(user_id, 'workout', workout_time, workout_calories, workout_type)
+    remaining_water = max(0, user['water_goal'] - user['logged_water'])
+    if len(workouts) == 1:
+        workout_type, workout_time, workout_calories, water_needed = workouts[0]
+        await message.reply(f"🏃‍♂️ Тренировка ({workout_type}) на {workout_time} минут — {workout_calories} ккал.\n"
+                            f"Дополнительно: выпейте {water_needed} мл воды.\n"
+                            f"Осталось: {remaining_water} мл воды.")
+        return
+    lines = [f"• {workout_type}: {workout_time} мин — {workout_calories} ккал"
+             for workout_type, workout_time, workout_calories, _ in workouts]
+    await message.reply("🏃‍♂️ Тренировки:\n" + "\n".join(lines) +
+                        f"\nИтого: {burned} ккал.\n"
+                        f"Дополнительно: выпейте {water} мл воды.\n"
+                        f"Осталось: {remaining_water} мл воды.")
 
 
 @router.message(Command("check_progress"))
 async def check_progress(message: Message):
     user_id = message.from_user.id
-    if user_id in users:
-        user = users[user_id]
+    user = await get_user(user_id)
+    if user is not None:
         water_progress = f"Выпито: {user['logged_water']} мл из {user['water_goal']} мл."
         remaining_water = user['water_goal'] - user['logged_water']
 
         calorie_progress = (f"Потреблено: {user['logged_calories']} ккал из {user['calorie_goal']} ккал.\n"
                             f"Сожжено: {user['burned_calories']} ккал.")
         balance_calories = user['logged_calories'] - user['burned_calories']
-        progress_chart = create_progress_chart(user)
         await message.reply(f"📊 Прогресс:\n\n"
                             f"Вода:\n"
                             f"{water_progress}\n"
@@ -410,82 +967,139 @@ async def check_progress(message: Message):
                             f"Калории:\n"
                             f"{calorie_progress}\n"
                             f"Баланс: {balance_calories} ккал.")
-        photo = BufferedInputFile(progress_chart.getvalue(), filename="progress_chart.png")
-        await message.answer_photo(photo=photo)
+        await send_progress_chart(message, user)
 
     else:
         await message.reply("Сначала настройте профиль с помощью команды /set_profile.")
 
 
-def create_progress_chart(user):
-    water_progress = user['logged_water']
-    water_goal = user['water_goal']
-    calories_progress = user['logged_calories']
-    calorie_goal = user['calorie_goal']
-    fig, ax = plt.subplots(1, 2, figsize=(12, 6))
-    ax[0].bar(['Выпито', 'Осталось'],
-              [water_progress, water_goal - water_progress],
-              color=['#1f77b4', '#ff7f0e'], edgecolor='black')
-    ax[0].set_title(f'Прогресс по воде ({water_progress} мл из {water_goal} мл)', fontsize=14, fontweight='bold',
-                    color='#1f77b4')
-    ax[0].set_ylim(0, water_goal * 1.2)
-    ax[0].set_facecolor('#f7f7f7')
-    ax[1].bar(['Потреблено', 'Осталось'],
-              [calories_progress, calorie_goal - calories_progress],
-              color=['#ff6347', '#98c379'], edgecolor='black')
-    ax[1].set_title(f'Прогресс по калориям ({calories_progress} ккал из {calorie_goal} ккал)', fontsize=14,
-                    fontweight='bold', color='#ff6347')
-    ax[1].set_ylim(0, calorie_goal * 1.2)
-    ax[1].set_facecolor('#f7f7f7')
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png")
-    buf.seek(0)
-    return buf
-
-
-async def get_low_calorie_food():
-    url = "https://trackapi.nutritionix.com/v2/search/instant/"
+def next_reminder_time(user_id, kind, timezone, now):
+    if kind == 'summary':
+        return next_local_time(timezone, SUMMARY_HOUR, now=now, offset=spread_offset(user_id, 1800))
+    candidate = now + REMINDER_INTERVAL_HOURS * 3600
+    local_hour = datetime.fromtimestamp(candidate, ZoneInfo(timezone)).hour
+    if REMINDER_START_HOUR <= local_hour < REMINDER_END_HOUR:
+        return candidate
+    return next_local_time(timezone, REMINDER_START_HOUR, now=now, offset=spread_offset(user_id, 3600))
+
+
+def schedule_reminders(user_id, user):
+    if not user.get('reminders', True):
+        return
+    timezone = user.get('timezone', DEFAULT_TIMEZONE)
+    now = time.time()
+    for kind in REMINDER_KINDS:
+        scheduler.schedule(user_id, kind, next_reminder_time(user_id, kind, timezone, now))
+
+
+async def plan_reminder(user_id, kind, fire_at):
+    user = await user_store.get(user_id)
+    if user is None or not user.get('reminders', True):
+        return None
+    return next_reminder_time(user_id, kind, user.get('timezone', DEFAULT_TIMEZONE), max(fire_at, time.time()))
+
+
+async def send_reminder(user_id, kind, fire_at):
+    if time.time() - fire_at > REMINDER_GRACE:
+        return
+    user = await get_user(user_id)
+    if user is None:
+        return
+    water_left = user['water_goal'] - user['logged_water']
+    if kind == 'water':
+        if water_left <= 0:
+            return
+        text = (f"💧 Не забудьте попить воды!\n"
+                f"Выпито: {user['logged_water']} мл из {user['water_goal']} мл. Осталось: {water_left} мл.")
+    else:
+        balance_calories = user['logged_calories'] - user['burned_calories']
+        text = (f"🌙 Итоги дня:\n\n"
+                f"Вода: {user['logged_water']} мл из {user['water_goal']} мл.\n"
+                f"Калории: {user['logged_calories']:.0f} ккал из {user['calorie_goal']} ккал.\n"
+                f"Сожжено: {user['burned_calories']} ккал.\n"
+                f"Баланс: {balance_calories:.0f} ккал.")
+    await outbound.send_message(bot, user_id, text)
+
+
+async def get_user(user_id):
+    user = await user_store.get(user_id)
+    if user is not None and roll_over(user, HISTORY_DAYS, DEFAULT_TIMEZONE):
+        user_store.mark_dirty(user_id)
+    return user
+
+
+async def send_progress_chart(message, user):
+    key = chart_key(user)
+    file_id = chart_renderer.get_file_id(key)
+    if file_id is not None:
+        await message.answer_photo(photo=file_id)
+        return
+    png = await chart_renderer.render(key)
+    sent = await message.answer_photo(photo=BufferedInputFile(png, filename="progress_chart.png"))
+    if sent.photo:
+        chart_renderer.remember_file_id(key, sent.photo[-1].file_id)
+
+
+async def get_low_calorie_food(query):
+    url = f"{NUTRITIONIX_URL}/search/instant/"
     headers = {
         "x-app-id": NUTRITIONIX_APP_ID,
         "x-app-key": NUTRITIONIX_API_KEY,
         "Content-Type": "application/json"
     }
     params = {
-        "query": "low calorie"
+        "query": query
     }
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        food_items = data.get("common", [])
-        if not food_items:
-            return []
-        low_calorie_foods = []
-        for food in food_items:
-            calories = food.get("nf_calories", 0)
-            if calories <= 50:
-                low_calorie_foods.append({
-                    'name': food.get("food_name", 'Неизвестно'),
-                    'calories': calories
-                })
-        if low_calorie_foods:
-            recommendations = random.sample(low_calorie_foods, k=min(5, len(low_calorie_foods)))
-            return recommendations
-        else:
-            return []
-
-    else:
+    data = await get_json(url, headers=headers, params=params)
+    if data is None:
         return None
+    low_calorie_foods = []
+    for food in data.get("common", []):
+        if 'nf_calories' not in food:
+            continue
+        serving = f"{food['serving_qty']:g} {food['serving_unit']}" if food.get('serving_unit') else None
+        low_calorie_foods.append({
+            'name': food.get("food_name", 'Неизвестно'),
+            'calories': food['nf_calories'],
+            'serving': serving
+        })
+    return low_calorie_foods
+
+
+async def refresh_recommendations():
+    sources = {}
+    if len(recommendation_pool) == 0:
+        sources['local'] = await asyncio.to_thread(local_candidates, RECOMMENDATION_MAX_CALORIES)
+    results = await asyncio.gather(*(get_low_calorie_food(query) for query in RECOMMENDATION_QUERIES))
+    for query, foods in zip(RECOMMENDATION_QUERIES, results):
+        if foods is not None:
+            sources[query] = foods
+    recommendation_pool.update(sources)
+    logging.info(f"Пул рекомендаций обновлён: {len(recommendation_pool)} продуктов")
+
+
+async def recommendation_refresh_loop():
+    while True:
+        try:
+            await refresh_recommendations()
+        except Exception:
+            logging.exception("Ошибка при обновлении пула рекомендаций")
+        await asyncio.sleep(RECOMMENDATION_REFRESH_INTERVAL)
 
 
 @router.message(Command("get_recommendations"))
-async def get_recommendations(message: Message):
-    products = await get_low_calorie_food()
+async def get_recommendations(message: Message, user_id=None):
+    user = await get_user(user_id or message.from_user.id)
+    budget = user['calorie_goal'] - user['logged_calories'] if user is not None else None
+    products = recommendation_pool.pick(budget)
 
     if products:
         response = "Рекомендованные продукты с низким содержанием калорий:\n"
-        for product in products[:5]:
-            response += f"{product['name']} — {product['calories']} ккал\n"
+        for product in products:
+            serving = f" ({product['serving']})" if product.get('serving') else ""
+            response += f"{product['name']} — {product['calories']:g} ккал{serving}\n"
+        if budget is not None:
+            response += f"\nОсталось на сегодня: {max(0, budget):.0f} ккал."
         await message.reply(response)
     else:
         await message.reply("Не удалось получить рекомендации.")
@@ -503,27 +1117,12 @@ async def preset_profile(message: Message):
         "city": "Moscow"
     }
 
-    temperature = get_weather(preset_data['city'])
+    temperature = await get_weather(preset_data['city'])
     if temperature is None:
         await message.reply("Не удалось получить данные о погоде. Попробуйте снова позже.")
         return
 
-    water_goal = calculate_water_goal(preset_data['weight'], preset_data['activity'], temperature)
-    calorie_goal = calculate_calorie_goal(preset_data['weight'], preset_data['height'], preset_data['age'],
-                                          preset_data['activity'])
-
-    users[user_id] = {
-        "weight": preset_data['weight'],
-        "height": preset_data['height'],
-        "age": preset_data['age'],
-        "activity": preset_data['activity'],
-        "city": preset_data['city'],
-        "water_goal": water_goal,
-        "calorie_goal": calorie_goal,
-        "logged_water": 0,
-        "logged_calories": 0,
-        "burned_calories": 0
-    }
+    user = await save_profile(user_id, preset_data, temperature)
 
     await message.reply(f"Профиль успешно установлен!\n\n"
                         f"Вес: {preset_data['weight']} кг\n"
@@ -531,8 +1130,81 @@ async def preset_profile(message: Message):
                         f"Возраст: {preset_data['age']} лет\n"
                         f"Активность: {preset_data['activity']} минут в день\n"
                         f"Город: {preset_data['city']}\n\n"
-                        f"Норма воды: {water_goal} мл\n"
-                        f"Норма калорий: {calorie_goal} ккал.")
+                        f"Норма воды: {user['water_goal']} мл\n"
+                        f"Норма калорий: {user['calorie_goal']} ккал.")
+
+
+@router.message(Command("history"))
+async def show_history(message: Message):
+    command_parts = message.text.split()
+    days = 7
+    if len(command_parts) > 1:
+        if not command_parts[1].isdigit():
+            await message.reply("Пожалуйста, укажите количество дней (например: /history 30).")
+            return
+        days = int(command_parts[1])
+
+    user = await get_user(message.from_user.id)
+    if user is None:
+        await message.reply("Сначала настройте профиль с помощью команды /set_profile.")
+        return
+
+    rows = history(user, days)
+    lines = [f"{day:%d.%m}: 💧 {water:.0f} мл, 🍽 {calories:.0f} ккал, 🔥 {burned:.0f} ккал"
+             for day, water, calories, burned in rows]
+    total_water = sum(row[1] for row in rows)
+    total_calories = sum(row[2] for row in rows)
+    total_burned = sum(row[3] for row in rows)
+    await message.reply(f"📅 История за {len(rows)} дн.:\n\n" + "\n".join(lines) +
+                        f"\n\nВ среднем за день: {total_water / len(rows):.0f} мл воды, "
+                        f"{total_calories / len(rows):.0f} ккал потреблено, "
+                        f"{total_burned / len(rows):.0f} ккал сожжено.")
+
+
+@router.message(Command("set_timezone"))
+async def set_timezone(message: Message):
+    command_parts = message.text.split()
+    if len(command_parts) != 2:
+        await message.reply("Пожалуйста, укажите часовой пояс (например: /set_timezone Europe/Moscow).")
+        return
+    try:
+        ZoneInfo(command_parts[1])
+    except (ZoneInfoNotFoundError, ValueError):
+        await message.reply("Неизвестный часовой пояс. Пример: Europe/Moscow, Asia/Yekaterinburg.")
+        return
+
+    user_id = message.from_user.id
+    user = await get_user(user_id)
+    if user is None:
+        await message.reply("Сначала настройте профиль с помощью команды /set_profile.")
+        return
+    user['timezone'] = command_parts[1]
+    roll_over(user, HISTORY_DAYS, DEFAULT_TIMEZONE)
+    user_store.mark_dirty(user_id)
+    await message.reply(f"Часовой пояс установлен: {command_parts[1]}.")
+
+
+@router.message(Command("reminders"))
+async def reminders(message: Message):
+    command_parts = message.text.split()
+    if len(command_parts) != 2 or command_parts[1] not in ("on", "off"):
+        await message.reply("Пожалуйста, укажите on или off (например: /reminders off).")
+        return
+
+    user_id = message.from_user.id
+    user = await get_user(user_id)
+    if user is None:
+        await message.reply("Сначала настройте профиль с помощью команды /set_profile.")
+        return
+    user['reminders'] = command_parts[1] == "on"
+    user_store.mark_dirty(user_id)
+    if user['reminders']:
+        schedule_reminders(user_id, user)
+        await message.reply("Напоминания о воде и итоги дня включены.")
+    else:
+        for kind in REMINDER_KINDS:
+            scheduler.cancel(user_id, kind)
+        await message.reply("Напоминания выключены.")
 
 
 def setup_handlers(dp):
@@ -542,9 +1214,42 @@ def setup_handlers(dp):
 
 
 if __name__ == "__main__":
+    import argparse
     import logging
     from aiohttp import web
     logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS)
+    parser.add_argument("--worker-index", type=int)
+    parser.add_argument("--source", choices=SOURCES, default=UPDATE_SOURCE,
+                        help="источник обновлений: webhook, long polling или воспроизведение JSONL")
+    parser.add_argument("--replay", nargs="+", default=[], metavar="FILE", help="файлы JSONL для --source replay")
+    args = parser.parse_args()
     port = int(os.environ.get("PORT", 8080))
-    setup_handlers(dp)
-    web.run_app(app, host="0.0.0.0", port=port)
+    UPDATE_SOURCE = args.source
+    if UPDATE_SOURCE != "webhook" and args.workers > 1:
+        parser.error("--workers больше 1 поддерживается только для webhook")
+    if UPDATE_SOURCE == "replay" and not args.replay:
+        parser.error("для --source replay укажите файлы через --replay")
+    if UPDATE_SOURCE == "replay" and not is_stub_api(TELEGRAM_API_URL):
+        parser.error("для --source replay укажите в TELEGRAM_API_URL адрес заглушки Bot API "
+                     "(например, python benchmarks/fake_services.py)")
+    if UPDATE_SOURCE == "replay":
+        setup_handlers(dp)
+        result = asyncio.run(run_replay(args.replay))
+        logging.info(f"Воспроизведено {result['sent']} обновлений за {result['elapsed']:.2f} с "
+                     f"({result['updates_per_second']:.1f} апдейтов/с), ошибок в хендлерах {result['failed']}, "
+                     f"некорректных строк {result['invalid']}")
+    elif args.workers > 1 and args.worker_index is None:
+        run_master(args.workers, WORKER_DRAIN_TIMEOUT)
+    else:
+        WORKER_COUNT = args.workers
+        WORKER_INDEX = args.worker_index or 0
+        if WORKER_COUNT > 1 and not INTERNAL_TOKEN:
+            parser.error("для воркеров, запущенных без мастера, задайте INTERNAL_TOKEN")
+        setup_handlers(dp)
+        if WORKER_COUNT > 1:
+            logging.info(f"Воркер {WORKER_INDEX} из {WORKER_COUNT} запущен")
+            web.run_app(app, host="0.0.0.0", port=port, reuse_port=True, shutdown_timeout=WORKER_DRAIN_TIMEOUT)
+        else:
+            web.run_app(app, host="0.0.0.0", port=port, shutdown_timeout=WORKER_DRAIN_TIMEOUT)
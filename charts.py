@@ -0,0 +1,151 @@
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from cache import TTLCache
+
+WIDTH, HEIGHT = 1200, 600
+FONT_PATHS = ('DejaVuSans.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+BOLD_FONT_PATHS = ('DejaVuSans-Bold.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf')
+
+
+def chart_key(user):
+    return user['logged_water'], user['water_goal'], user['logged_calories'], user['calorie_goal']
+
+
+def render_progress_png_matplotlib(water_progress, water_goal, calories_progress, calorie_goal):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(12, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots(1, 2)
+    ax[0].bar(['Выпито', 'Осталось'],
+              [water_progress, water_goal - water_progress],
+              color=['#1f77b4', '#ff7f0e'], edgecolor='black')
+    ax[0].set_title(f'Прогресс по воде ({water_progress} мл из {water_goal} мл)', fontsize=14, fontweight='bold',
+                    color='#1f77b4')
+    ax[0].set_ylim(0, water_goal * 1.2)
+    ax[0].set_facecolor('#f7f7f7')
+    ax[1].bar(['Потреблено', 'Осталось'],
+              [calories_progress, calorie_goal - calories_progress],
+              color=['#ff6347', '#98c379'], edgecolor='black')
+    ax[1].set_title(f'Прогресс по калориям ({calories_progress} ккал из {calorie_goal} ккал)', fontsize=14,
+                    fontweight='bold', color='#ff6347')
+    ax[1].set_ylim(0, calorie_goal * 1.2)
+    ax[1].set_facecolor('#f7f7f7')
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+@lru_cache(maxsize=None)
+def _font(size, bold=False):
+    from PIL import ImageFont
+    for path in BOLD_FONT_PATHS if bold else FONT_PATHS:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def _draw_panel(draw, left, title, title_color, labels, values, colors, goal):
+    top, bottom = 70, HEIGHT - 60
+    plot_left, plot_right = left + 70, left + WIDTH // 2 - 20
+    ymax = max(goal * 1.2, max(values), 1)
+
+    title_font = _font(16, bold=True)
+    title_width = draw.textlength(title, font=title_font)
+    draw.text((left + (WIDTH // 2 - title_width) / 2, 25), title, fill=title_color, font=title_font)
+    draw.rectangle((plot_left, top, plot_right, bottom), fill='#f7f7f7', outline='black')
+
+    tick_font = _font(12)
+    for i in range(6):
+        value = ymax * i / 5
+        y = bottom - (bottom - top) * i / 5
+        draw.line((plot_left - 5, y, plot_left, y), fill='black')
+        label = f"{value:.0f}"
+        draw.text((plot_left - 8 - draw.textlength(label, font=tick_font), y - 7), label, fill='black',
+                  font=tick_font)
+
+    slot = (plot_right - plot_left) / len(values)
+    bar_width = slot * 0.8
+    label_font = _font(14)
+    for i, (label, value, color) in enumerate(zip(labels, values, colors)):
+        x0 = plot_left + slot * i + (slot - bar_width) / 2
+        y0 = bottom - (bottom - top) * max(0, min(value, ymax)) / ymax
+        if y0 < bottom:
+            draw.rectangle((x0, y0, x0 + bar_width, bottom), fill=color, outline='black')
+        draw.text((x0 + (bar_width - draw.textlength(label, font=label_font)) / 2, bottom + 10), label,
+                  fill='black', font=label_font)
+
+
+def render_progress_png_pillow(water_progress, water_goal, calories_progress, calorie_goal):
+    from PIL import Image, ImageDraw
+    image = Image.new('RGB', (WIDTH, HEIGHT), 'white')
+    draw = ImageDraw.Draw(image)
+    _draw_panel(draw, 0, f'Прогресс по воде ({water_progress} мл из {water_goal} мл)', '#1f77b4',
+                ['Выпито', 'Осталось'], [water_progress, water_goal - water_progress], ['#1f77b4', '#ff7f0e'],
+                water_goal)
+    _draw_panel(draw, WIDTH // 2, f'Прогресс по калориям ({calories_progress} ккал из {calorie_goal} ккал)', '#ff6347',
+                ['Потреблено', 'Осталось'], [calories_progress, calorie_goal - calories_progress],
+                ['#ff6347', '#98c379'], calorie_goal)
+    buf = io.BytesIO()
+    image.save(buf, format="PNG", optimize=False, compress_level=1)
+    return buf.getvalue()
+
+
+def preload_renderer(backend):
+    if backend == 'matplotlib':
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+    else:
+        _font(12)
+        _font(14)
+        _font(16, bold=True)
+
+
+RENDERERS = {
+    'matplotlib': render_progress_png_matplotlib,
+    'pillow': render_progress_png_pillow
+}
+
+
+def create_progress_chart(user, backend='matplotlib'):
+    buf = io.BytesIO(RENDERERS[backend](*chart_key(user)))
+    buf.seek(0)
+    return buf
+
+
+class ChartRenderer:
+    def __init__(self, cache_size=1024, workers=2, executor="thread", backend="matplotlib"):
+        self._render = RENDERERS[backend]
+        if executor == "process":
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chart")
+        self.images = TTLCache(maxsize=cache_size, ttl=float('inf'))
+        self.file_ids = TTLCache(maxsize=cache_size, ttl=float('inf'))
+
+    async def render(self, key):
+        loop = asyncio.get_running_loop()
+        return await self.images.get_or_fetch(key, lambda: loop.run_in_executor(self._executor,
+                                                                                  self._render, *key))
+
+    def get_file_id(self, key):
+        file_id = self.file_ids.get(key)
+        if file_id is None:
+            self.file_ids.misses += 1
+        else:
+            self.file_ids.hits += 1
+        return file_id
+
+    def remember_file_id(self, key, file_id):
+        self.file_ids.set(key, file_id)
+
+    def stats(self):
+        return {'images': self.images.stats(), 'file_ids': self.file_ids.stats()}
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
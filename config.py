@@ -1,7 +1,9 @@
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+if os.path.exists(ENV_FILE):
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
 
 API_TOKEN = os.getenv("API_TOKEN")
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
@@ -18,4 +20,70 @@ if not NUTRITIONIX_API_KEY:
     raise ValueError("Переменная окружения NUTRITIONIX_API_KEY не установлена!")
 
 if not NUTRITIONIX_APP_ID:
-    raise ValueError("Переменная окружения NUTRITIONIX_APP_ID не установлена!")
\ No newline at end of file
+    raise ValueError("Переменная окружения NUTRITIONIX_APP_ID не установлена!")
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3))
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", 20))
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", 30))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 2))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", 0.5))
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", 900))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", 256))
+NUTRITION_CACHE_PATH = os.getenv("NUTRITION_CACHE_PATH", "data/nutrition_cache.sqlite3")
+NUTRITION_CACHE_SIZE = int(os.getenv("NUTRITION_CACHE_SIZE", 4096))
+FOOD_INDEX_PATH = os.getenv("FOOD_INDEX_PATH", "resources/foods.idx")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+STORAGE_PATH = os.getenv("STORAGE_PATH", "data/users.sqlite3")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+STORAGE_FLUSH_INTERVAL = float(os.getenv("STORAGE_FLUSH_INTERVAL", 1.0))
+STORAGE_BATCH_SIZE = int(os.getenv("STORAGE_BATCH_SIZE", 500))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", 1))
+INTERNAL_PORT_BASE = int(os.getenv("INTERNAL_PORT_BASE", 9100))
+WORKER_DRAIN_TIMEOUT = float(os.getenv("WORKER_DRAIN_TIMEOUT", 30))
+UPDATE_CONSUMERS = int(os.getenv("UPDATE_CONSUMERS", 8))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", 1000))
+UPDATE_DEDUP_SIZE = int(os.getenv("UPDATE_DEDUP_SIZE", 10000))
+OVERLOAD_POLICY = os.getenv("OVERLOAD_POLICY", "shed")
+CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", 1024))
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", 2))
+CHART_EXECUTOR = os.getenv("CHART_EXECUTOR", "thread")
+CHART_BACKEND = os.getenv("CHART_BACKEND", "pillow")
+INTAKE_LOG_PATH = os.getenv("INTAKE_LOG_PATH", "data/intake_log.sqlite3")
+HISTORY_DAYS = int(os.getenv("HISTORY_DAYS", 30))
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "Europe/Moscow")
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", 30))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", 1))
+SEND_CHAT_BURST = int(os.getenv("SEND_CHAT_BURST", 3))
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", 16))
+SCHEDULE_PATH = os.getenv("SCHEDULE_PATH", "data/schedules.sqlite3")
+SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", 200))
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", 50))
+REMINDER_INTERVAL_HOURS = float(os.getenv("REMINDER_INTERVAL_HOURS", 3))
+REMINDER_START_HOUR = int(os.getenv("REMINDER_START_HOUR", 9))
+REMINDER_END_HOUR = int(os.getenv("REMINDER_END_HOUR", 21))
+SUMMARY_HOUR = int(os.getenv("SUMMARY_HOUR", 21))
+REMINDER_GRACE = float(os.getenv("REMINDER_GRACE", 1800))
+WEATHER_GROUP_SIZE = int(os.getenv("WEATHER_GROUP_SIZE", 20))
+GOAL_REFRESH_INTERVAL = float(os.getenv("GOAL_REFRESH_INTERVAL", 3600))
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+OPENWEATHER_URL = os.getenv("OPENWEATHER_URL", "https://api.openweathermap.org/data/2.5")
+NUTRITIONIX_URL = os.getenv("NUTRITIONIX_URL", "https://trackapi.nutritionix.com/v2")
+OPENFOODFACTS_URL = os.getenv("OPENFOODFACTS_URL", "https://world.openfoodfacts.org")
+TRANSLATE_TIMEOUT = float(os.getenv("TRANSLATE_TIMEOUT", 5))
+TRANSLATE_WORKERS = int(os.getenv("TRANSLATE_WORKERS", 4))
+RECOMMENDATION_MAX_CALORIES = float(os.getenv("RECOMMENDATION_MAX_CALORIES", 50))
+RECOMMENDATION_QUERIES = [query.strip() for query in os.getenv("RECOMMENDATION_QUERIES", "low calorie").split(",")
+                          if query.strip()]
+RECOMMENDATION_REFRESH_INTERVAL = float(os.getenv("RECOMMENDATION_REFRESH_INTERVAL", 6 * 3600))
+USER_LOCK_SHARDS = int(os.getenv("USER_LOCK_SHARDS", 1024))
+UPDATE_SOURCE = os.getenv("UPDATE_SOURCE", "webhook")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "https://hse-apy-tg-bot.onrender.com/webhook")
+POLLING_TIMEOUT = int(os.getenv("POLLING_TIMEOUT", 30))
+POLLING_LIMIT = int(os.getenv("POLLING_LIMIT", 100))
+UPDATE_RECORD_PATH = os.getenv("UPDATE_RECORD_PATH")
+FSM_STORAGE_PATH = os.getenv("FSM_STORAGE_PATH", "data/fsm.sqlite3")
+INTERNAL_TOKEN = os.getenv("INTERNAL_TOKEN")
@@ -0,0 +1,253 @@
+import argparse
+import array
+import csv
+import gzip
+import io
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from itertools import chain
+
+MAGIC = b'FDB1'
+VERSION = 2
+HEADER = struct.Struct('<4s6I')
+BUNDLED_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', 'foods.csv')
+MIN_SCORE = 0.7
+
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+def normalize_name(text):
+    text = text.lower().replace('ё', 'е')
+    return ' '.join(_NON_WORD.sub(' ', text).split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {zlib.crc32(padded[i:i + 3].encode('utf-8')) for i in range(len(padded) - 2)}
+
+
+def read_bundled_csv(path):
+    foods = []
+    with open(path, encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            names = [row['name_ru'], row['name_en']]
+            names += [alias for alias in (row.get('aliases') or '').split('|') if alias]
+            foods.append((row['name_ru'], float(row['kcal_100g']), names))
+    return foods
+
+
+def read_openfoodfacts_csv(path, min_calories=0.0, max_calories=900.0):
+    csv.field_size_limit(sys.maxsize)
+    opener = gzip.open if path.endswith('.gz') else open
+    seen = set()
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f, delimiter='\t'):
+            try:
+                calories = float(row.get('energy-kcal_100g') or '')
+            except ValueError:
+                continue
+            if not min_calories < calories <= max_calories:
+                continue
+            names = [row.get(column) or '' for column in ('product_name_ru', 'product_name_en', 'product_name')]
+            names = [name.strip() for name in names if name and name.strip()]
+            if not names:
+                continue
+            key = normalize_name(names[0])
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            yield names[0], calories, names
+
+
+def build_index(foods):
+    blob = bytearray()
+    calories = array.array('f')
+    name_offsets = array.array('I')
+    alias_food = array.array('I')
+    alias_trigrams = array.array('I')
+    postings = defaultdict(list)
+    seen_aliases = set()
+    entries = []
+
+    for food_id, (name, kcal, aliases) in enumerate(foods):
+        calories.append(kcal)
+        name_offsets.append(len(blob))
+        blob += name.encode('utf-8')
+        for alias in aliases:
+            alias = normalize_name(alias)
+            if not alias or alias in seen_aliases:
+                continue
+            seen_aliases.add(alias)
+            entries.append((food_id, trigrams(alias)))
+    name_offsets.append(len(blob))
+
+    # алиасы нумеруются по числу триграмм: списки вхождений упорядочены по длине алиаса,
+    # и поиск отрезает неподходящие по длине алиасы бинарным поиском, не обходя их
+    entries.sort(key=lambda entry: len(entry[1]))
+    for alias_id, (food_id, grams) in enumerate(entries):
+        alias_food.append(food_id)
+        alias_trigrams.append(len(grams))
+        for gram in grams:
+            postings[gram].append(alias_id)
+
+    keys = array.array('I', sorted(postings))
+    starts = array.array('I')
+    flat = array.array('I')
+    for key in keys:
+        starts.append(len(flat))
+        flat.extend(postings[key])
+    starts.append(len(flat))
+
+    if sys.byteorder != 'little':
+        for section in (calories, name_offsets, alias_food, alias_trigrams, keys, starts, flat):
+            section.byteswap()
+
+    out = io.BytesIO()
+    out.write(HEADER.pack(MAGIC, VERSION, len(calories), len(alias_food), len(keys), len(flat), len(blob)))
+    for section in (calories, name_offsets, alias_food, alias_trigrams, keys, starts, flat):
+        out.write(section.tobytes())
+    out.write(blob)
+    return out.getvalue()
+
+
+class FoodIndex:
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magic, version, n_foods, n_aliases, n_trigrams, n_postings, blob_size = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Неизвестный формат индекса продуктов")
+        view = memoryview(buffer)
+        offset = HEADER.size
+
+        def section(count, fmt):
+            nonlocal offset
+            part = view[offset:offset + count * 4].cast(fmt)
+            offset += count * 4
+            return part
+
+        self._calories = section(n_foods, 'f')
+        self._name_offsets = section(n_foods + 1, 'I')
+        self._alias_food = section(n_aliases, 'I')
+        self._alias_trigrams = section(n_aliases, 'I')
+        self._keys = section(n_trigrams, 'I')
+        self._starts = section(n_trigrams + 1, 'I')
+        self._postings = section(n_postings, 'I')
+        self._blob = view[offset:offset + blob_size]
+
+    def __len__(self):
+        return len(self._calories)
+
+    def _find(self, key):
+        lo, hi = 0, len(self._keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._keys[mid] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._keys) and self._keys[lo] == key:
+            return self._postings[self._starts[lo]:self._starts[lo + 1]]
+        return ()
+
+    def _food(self, food_id):
+        name = bytes(self._blob[self._name_offsets[food_id]:self._name_offsets[food_id + 1]]).decode('utf-8')
+        return {'name': name, 'calories': round(self._calories[food_id], 1)}
+
+    @staticmethod
+    def _contains(postings, alias_id):
+        i = bisect_left(postings, alias_id)
+        return i < len(postings) and postings[i] == alias_id
+
+    def lookup(self, query, min_score=MIN_SCORE):
+        query = normalize_name(query)
+        if not query:
+            return None
+        grams = trigrams(query)
+        n = len(grams)
+        # префиксный фильтр: при коэффициенте Дайса не ниже min_score у подходящего алиаса не меньше required общих
+        # триграмм, значит он есть хотя бы в одном из n - required + 1 самых коротких списков; длинные списки
+        # частых триграмм не обходим целиком, а только проверяем в них найденных кандидатов бинарным поиском
+        smallest = max(1, math.ceil(n * min_score / (2 - min_score) - 1e-9))
+        lo = bisect_left(self._alias_trigrams, smallest)
+        hi = len(self._alias_trigrams)
+        if min_score > 0:
+            hi = bisect_right(self._alias_trigrams, math.floor(n * (2 - min_score) / min_score + 1e-9))
+        lists = []
+        for gram in grams:
+            postings = self._find(gram)
+            lists.append(postings[bisect_left(postings, lo):bisect_left(postings, hi)])
+        lists.sort(key=len)
+        required = max(1, math.ceil(min_score * (n + smallest) / 2 - 1e-9))
+        prefix, rest = lists[:n - required + 1], lists[n - required + 1:]
+        shared = Counter(chain.from_iterable(prefix))
+        # кандидаты с большим числом общих триграмм проверяем первыми: лучший коэффициент быстро растёт,
+        # и как только даже самый короткий алиас с таким числом совпадений не может его превзойти, поиск закончен
+        best_id, best_score = None, 0.0
+        for alias_id, count in shared.most_common():
+            if 2 * (count + len(rest)) / (n + smallest) < max(best_score, min_score):
+                break
+            size = n + self._alias_trigrams[alias_id]
+            bound = 2 * (count + len(rest)) / size
+            if bound < min_score or bound < best_score:
+                continue
+            count += sum(1 for postings in rest if self._contains(postings, alias_id))
+            score = 2 * count / size
+            if score > best_score or score == best_score and alias_id < best_id:
+                best_id, best_score = alias_id, score
+        if best_id is None or best_score < min_score:
+            return None
+        return self._food(self._alias_food[best_id])
+
+    def close(self):
+        for part in (self._calories, self._name_offsets, self._alias_food, self._alias_trigrams, self._keys,
+                     self._starts, self._postings, self._blob):
+            part.release()
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+
+def load_index(path):
+    if path and os.path.exists(path):
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            index = FoodIndex(buffer)
+        except ValueError:
+            buffer.close()
+            logging.warning(f"Индекс продуктов {path} собран старой версией, пересоберите его: python food_db.py")
+        else:
+            logging.info(f"Индекс продуктов загружен из {path}")
+            return index
+    logging.info("Собранный индекс продуктов не найден, строим из встроенной таблицы")
+    return FoodIndex(build_index(read_bundled_csv(BUNDLED_CSV)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка локального индекса продуктов")
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(BUNDLED_CSV), 'foods.idx'))
+    parser.add_argument('--openfoodfacts', help="TSV-выгрузка OpenFoodFacts (можно .gz)")
+    parser.add_argument('--limit', type=int, default=0, help="Максимум продуктов из выгрузки OpenFoodFacts")
+    args = parser.parse_args()
+
+    foods = read_bundled_csv(BUNDLED_CSV)
+    if args.openfoodfacts:
+        for i, food in enumerate(read_openfoodfacts_csv(args.openfoodfacts)):
+            if args.limit and i >= args.limit:
+                break
+            foods.append(food)
+    data = build_index(foods)
+    with open(args.output, 'wb') as f:
+        f.write(data)
+    print(f"Записано {len(foods)} продуктов, {len(data)} байт в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+from storage import create_backend
+
+
+def record_key(key):
+    return f"{key.chat_id}:{key.thread_id or 0}:{key.business_connection_id or ''}:{key.destiny}"
+
+
+class BackendStorage(BaseStorage):
+    # активных диалогов немного: они целиком держатся в памяти, а каждое изменение сразу пишется в бэкенд,
+    # поэтому чтение состояния на каждый апдейт не ходит в базу, а после рестарта диалог продолжается
+    def __init__(self, backend):
+        self.backend = backend
+        self._records = None
+
+    async def _user_records(self, user_id):
+        if self._records is None:
+            records = await self.backend.load_all()
+            if self._records is None:
+                self._records = records
+        return self._records.get(user_id, {})
+
+    async def _save(self, key, state, data):
+        records = dict(await self._user_records(key.user_id))
+        if state is None and not data:
+            records.pop(record_key(key), None)
+        else:
+            records[record_key(key)] = {'state': state, 'data': data}
+        if records:
+            self._records[key.user_id] = records
+            await self.backend.save_many({key.user_id: records})
+        elif self._records.pop(key.user_id, None) is not None:
+            await self.backend.delete(key.user_id)
+
+    async def _get(self, key):
+        return (await self._user_records(key.user_id)).get(record_key(key), {})
+
+    async def set_state(self, key, state=None):
+        state = state.state if isinstance(state, State) else state
+        await self._save(key, state, (await self._get(key)).get('data') or {})
+
+    async def get_state(self, key):
+        return (await self._get(key)).get('state')
+
+    async def set_data(self, key, data):
+        await self._save(key, (await self._get(key)).get('state'), dict(data))
+
+    async def get_data(self, key):
+        return dict((await self._get(key)).get('data') or {})
+
+    async def close(self):
+        await self.backend.close()
+
+
+def create_fsm_storage(name, path=None, url=None):
+    if name == "memory":
+        return MemoryStorage()
+    if name == "redis":
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+        except ImportError:
+            raise RuntimeError("Для STORAGE_BACKEND=redis установите пакет redis")
+        return RedisStorage.from_url(url)
+    return BackendStorage(create_backend(name, path=path, url=url))
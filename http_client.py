@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import time
+from urllib.parse import urlsplit
+import aiohttp
+from metrics import UPSTREAM_LATENCY, UPSTREAM_ERRORS
+from config import HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_KEEPALIVE, \
+    HTTP_RETRIES, HTTP_BACKOFF, OPENWEATHER_URL, NUTRITIONIX_URL, OPENFOODFACTS_URL
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+API_NAMES = {
+    urlsplit(OPENWEATHER_URL).netloc: 'openweather',
+    urlsplit(NUTRITIONIX_URL).netloc: 'nutritionix',
+    urlsplit(OPENFOODFACTS_URL).netloc: 'openfoodfacts'
+}
+
+_session = None
+
+
+async def start_http_session():
+    global _session
+    if _session is not None and not _session.closed:
+        return _session
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE,
+        ttl_dns_cache=300
+    )
+    timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT, sock_connect=HTTP_CONNECT_TIMEOUT)
+    _session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    logging.info("HTTP-сессия создана")
+    return _session
+
+
+async def close_http_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logging.info("HTTP-сессия закрыта")
+    _session = None
+
+
+def get_session():
+    if _session is None or _session.closed:
+        raise RuntimeError("HTTP-сессия не создана, вызовите start_http_session()")
+    return _session
+
+
+async def fetch_json(method, url, **kwargs):
+    session = get_session()
+    host = urlsplit(url).netloc
+    api = API_NAMES.get(host, host)
+    for attempt in range(HTTP_RETRIES + 1):
+        started = time.perf_counter()
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                if response.status == 200:
+                    data = await response.json(content_type=None)
+                    UPSTREAM_LATENCY.observe(time.perf_counter() - started, api=api)
+                    return data
+                UPSTREAM_LATENCY.observe(time.perf_counter() - started, api=api)
+                UPSTREAM_ERRORS.inc(api=api)
+                if response.status not in RETRY_STATUSES:
+                    logging.warning(f"{method} {url} вернул {response.status}")
+                    return None
+                retry_after = response.headers.get("Retry-After")
+                logging.warning(f"{method} {url} вернул {response.status}, попытка {attempt + 1}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            UPSTREAM_LATENCY.observe(time.perf_counter() - started, api=api)
+            UPSTREAM_ERRORS.inc(api=api)
+            retry_after = None
+            logging.warning(f"{method} {url} завершился ошибкой {e!r}, попытка {attempt + 1}")
+        if attempt < HTTP_RETRIES:
+            delay = HTTP_BACKOFF * 2 ** attempt
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            await asyncio.sleep(delay)
+    return None
+
+
+async def get_json(url, **kwargs):
+    return await fetch_json("GET", url, **kwargs)
+
+
+async def post_json(url, **kwargs):
+    return await fetch_json("POST", url, **kwargs)
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+HISTORY_FIELDS = (
+    ('logged_water', 'history_water'),
+    ('logged_calories', 'history_calories'),
+    ('burned_calories', 'history_burned')
+)
+CARRIED_FIELDS = ('timezone', 'day', 'reminders') + tuple(column for _, column in HISTORY_FIELDS)
+
+
+def local_day(timezone, now=None):
+    return datetime.fromtimestamp(now or time.time(), ZoneInfo(timezone)).date().toordinal()
+
+
+def roll_over(user, history_days, default_timezone, now=None):
+    today = local_day(user.setdefault('timezone', default_timezone), now)
+    day = user.get('day')
+    if day is None:
+        user['day'] = today
+        for _, column in HISTORY_FIELDS:
+            user[column] = [0] * history_days
+        return True
+    if day >= today:
+        return False
+    for total, column in HISTORY_FIELDS:
+        ring = user[column]
+        ring[day % len(ring)] = user[total]
+        for skipped in range(day + 1, min(today, day + 1 + len(ring))):
+            ring[skipped % len(ring)] = 0
+        user[total] = 0
+    user['day'] = today
+    return True
+
+
+def carry_history(old_user, new_user):
+    if old_user is not None:
+        for field in CARRIED_FIELDS:
+            if field in old_user:
+                new_user[field] = old_user[field]
+    return new_user
+
+
+def history(user, days):
+    today = user['day']
+    rings = [user[column] for _, column in HISTORY_FIELDS]
+    size = len(rings[0])
+    days = max(1, min(days, size + 1))
+    rows = []
+    for day in range(today - days + 1, today):
+        rows.append((date.fromordinal(day),) + tuple(ring[day % size] for ring in rings))
+    rows.append((date.fromordinal(today),) + tuple(user[total] for total, _ in HISTORY_FIELDS))
+    return rows
+
+
+class IntakeLog:
+    def __init__(self, path, flush_interval=1.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.flush_interval = flush_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS events (user_id INTEGER NOT NULL, ts REAL NOT NULL, "
+                               "kind TEXT NOT NULL, amount REAL NOT NULL, calories REAL NOT NULL, label TEXT)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS events_user_ts ON events (user_id, ts)")
+        self._pending = []
+        self._flush_task = None
+
+    def append(self, user_id, kind, amount, calories=0, label=None, ts=None):
+        self._pending.append((user_id, ts or time.time(), kind, amount, calories, label))
+
+    def _insert(self, rows):
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        try:
+            await asyncio.to_thread(self._insert, rows)
+        except Exception:
+            logging.exception("Не удалось записать журнал приёмов")
+            self._pending = rows + self._pending
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from cache import TTLCache
+
+
+def normalize_query(text):
+    return ' '.join(text.split()).lower()
+
+
+class NutritionStore:
+    def __init__(self, path, lru_size):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS translations (query TEXT PRIMARY KEY, translated TEXT NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS foods "
+                               "(query TEXT PRIMARY KEY, name TEXT NOT NULL, calories REAL NOT NULL)")
+        self.translations = TTLCache(maxsize=lru_size, ttl=float('inf'))
+        self.foods = TTLCache(maxsize=lru_size, ttl=float('inf'))
+
+    def _select(self, sql, key):
+        with self._lock:
+            return self._conn.execute(sql, (key,)).fetchone()
+
+    def _upsert(self, sql, params):
+        with self._lock, self._conn:
+            self._conn.execute(sql, params)
+
+    def _select_foods(self, keys):
+        placeholders = ','.join('?' * len(keys))
+        with self._lock:
+            return self._conn.execute(f"SELECT query, name, calories FROM foods WHERE query IN ({placeholders})",
+                                      keys).fetchall()
+
+    def _upsert_foods(self, rows):
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO foods VALUES (?, ?, ?)", rows)
+
+    async def get_translation(self, text, translate):
+        key = normalize_query(text)
+
+        async def load():
+            row = await asyncio.to_thread(self._select, "SELECT translated FROM translations WHERE query = ?", key)
+            if row is not None:
+                return row[0]
+            translated = await translate(key)
+            if translated:
+                translated = normalize_query(translated)
+                await asyncio.to_thread(self._upsert, "INSERT OR REPLACE INTO translations VALUES (?, ?)",
+                                        (key, translated))
+            return translated
+
+        return await self.translations.get_or_fetch(key, load)
+
+    async def get_food(self, query, fetch):
+        key = normalize_query(query)
+
+        async def load():
+            row = await asyncio.to_thread(self._select, "SELECT name, calories FROM foods WHERE query = ?", key)
+            if row is not None:
+                return {'name': row[0], 'calories': row[1]}
+            food = await fetch(key)
+            if food:
+                await asyncio.to_thread(self._upsert, "INSERT OR REPLACE INTO foods VALUES (?, ?, ?)",
+                                        (key, food['name'], food['calories']))
+            return food
+
+        return await self.foods.get_or_fetch(key, load)
+
+    async def get_foods(self, queries, fetch_many):
+        foods = {}
+        missing = []
+        for key in dict.fromkeys(normalize_query(query) for query in queries):
+            food = self.foods.get(key)
+            if food is not None:
+                self.foods.hits += 1
+                foods[key] = food
+            else:
+                self.foods.misses += 1
+                missing.append(key)
+        if missing:
+            for key, name, calories in await asyncio.to_thread(self._select_foods, missing):
+                foods[key] = {'name': name, 'calories': calories}
+                self.foods.set(key, foods[key])
+            missing = [key for key in missing if key not in foods]
+        if missing:
+            rows = []
+            for key, food in (await fetch_many(missing)).items():
+                if food:
+                    foods[key] = food
+                    self.foods.set(key, food)
+                    rows.append((key, food['name'], food['calories']))
+            if rows:
+                await asyncio.to_thread(self._upsert_foods, rows)
+        return foods
+
+    def stats(self):
+        return {'translations': self.translations.stats(), 'foods': self.foods.stats()}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
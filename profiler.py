@@ -0,0 +1,38 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+_running = threading.Lock()
+
+
+def _folded_stack(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def sample(thread_id, duration, interval):
+    counts = Counter()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            counts[_folded_stack(frame)] += 1
+        del frame
+        time.sleep(interval)
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common()) + "\n"
+
+
+async def profile_event_loop(duration, interval):
+    if not _running.acquire(blocking=False):
+        return None
+    try:
+        return await asyncio.to_thread(sample, threading.get_ident(), duration, interval)
+    finally:
+        _running.release()
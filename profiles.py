@@ -0,0 +1,110 @@
+from array import array
+
+FIELDS = ('weight', 'height', 'age', 'activity', 'city', 'water_goal', 'calorie_goal', 'logged_water',
+          'logged_calories', 'burned_calories', 'timezone', 'day', 'reminders', 'history_water',
+          'history_calories', 'history_burned')
+_FIELDS = frozenset(FIELDS)
+RINGS = frozenset(('history_water', 'history_calories', 'history_burned'))
+
+
+class Profile:
+    # фиксированный набор слотов вместо словаря, а доступ по ключу оставлен, чтобы хендлеры работали с профилем
+    # как раньше; кольца истории хранятся массивами чисел, а не списками отдельных объектов int и float
+    __slots__ = FIELDS
+
+    def __init__(self, **fields):
+        for name, value in fields.items():
+            self[name] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        profile = cls()
+        for name, value in data.items():
+            if name in _FIELDS:
+                profile[name] = value
+        return profile
+
+    def __getitem__(self, name):
+        if name not in _FIELDS:
+            raise KeyError(name)
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __setitem__(self, name, value):
+        if name not in _FIELDS:
+            raise KeyError(name)
+        if name in RINGS and not isinstance(value, array):
+            value = array('d', value)
+        setattr(self, name, value)
+
+    def __contains__(self, name):
+        return name in _FIELDS and hasattr(self, name)
+
+    def __iter__(self):
+        return (name for name in FIELDS if hasattr(self, name))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __eq__(self, other):
+        if isinstance(other, (Profile, dict)):
+            return self.to_dict() == Profile.from_dict(other).to_dict()
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Profile({self.to_dict()!r})"
+
+    def to_dict(self):
+        return {name: list(value) if name in RINGS else value for name, value in self.items()}
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self]
+
+    def get(self, name, default=None):
+        if name not in _FIELDS:
+            return default
+        return getattr(self, name, default)
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+
+def calculate_water_goal(weight, activity, temperature):
+    base = weight * 30
+    activity_bonus = (activity // 30) * 500
+    weather_bonus = 500 if temperature > 25 else 0
+    return base + activity_bonus + weather_bonus
+
+
+def calculate_calorie_goal(weight, height, age, activity):
+    base = 10 * weight + 6.25 * height - 5 * age
+    activity_bonus = (activity // 30) * 50
+    return base + activity_bonus
+
+
+def calculate_water_goals(weight, activity, temperature):
+    import numpy as np
+    weight, activity, temperature = np.asarray(weight), np.asarray(activity), np.asarray(temperature)
+    return weight * 30 + (activity // 30) * 500 + np.where(temperature > 25, 500, 0)
+
+
+def calculate_calorie_goals(weight, height, age, activity):
+    import numpy as np
+    weight, height, age, activity = np.asarray(weight), np.asarray(height), np.asarray(age), np.asarray(activity)
+    return 10 * weight + 6.25 * height - 5 * age + (activity // 30) * 50
+
+
+def create_profile(weight, height, age, activity, city, temperature):
+    return Profile(weight=weight, height=height, age=age, activity=activity, city=city,
+                   water_goal=calculate_water_goal(weight, activity, temperature),
+                   calorie_goal=calculate_calorie_goal(weight, height, age, activity),
+                   logged_water=0, logged_calories=0, burned_calories=0)
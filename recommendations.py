@@ -0,0 +1,44 @@
+import bisect
+import random
+import time
+from food_db import BUNDLED_CSV, read_bundled_csv
+
+NOT_RECOMMENDED = {'пиво', 'вино', 'кола'}
+
+
+def local_candidates(max_calories, path=BUNDLED_CSV):
+    return [{'name': name, 'calories': calories, 'serving': "100 г"}
+            for name, calories, _ in read_bundled_csv(path) if calories <= max_calories and name not in NOT_RECOMMENDED]
+
+
+class RecommendationPool:
+    def __init__(self, max_calories=50):
+        self.max_calories = max_calories
+        self._calories = []
+        self._foods = []
+        self._sources = {}
+        self.updated_at = None
+
+    def update(self, sources):
+        self._sources.update(sources)
+        foods = {}
+        for source_foods in self._sources.values():
+            for food in source_foods:
+                if 0 <= food['calories'] <= self.max_calories:
+                    foods.setdefault(food['name'].lower(), food)
+        ordered = sorted(foods.values(), key=lambda food: food['calories'])
+        self._calories, self._foods = [food['calories'] for food in ordered], ordered
+        self.updated_at = time.time()
+
+    def __len__(self):
+        return len(self._foods)
+
+    def pick(self, budget=None, k=5, rng=random):
+        calories, foods = self._calories, self._foods
+        if budget is not None:
+            foods = foods[:max(k, bisect.bisect_right(calories, budget))]
+        return sorted(rng.sample(foods, min(k, len(foods))), key=lambda food: food['calories'])
+
+    def stats(self):
+        return {'size': len(self), 'sources': {name: len(foods) for name, foods in self._sources.items()},
+                'updated_at': self.updated_at}
@@ -0,0 +1,163 @@
+import asyncio
+import heapq
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+
+def next_local_time(timezone, hour, minute=0, now=None, offset=0):
+    zone = ZoneInfo(timezone)
+    now = now or time.time()
+    local_now = datetime.fromtimestamp(now, zone)
+    target = local_now.replace(hour=hour, minute=minute, second=0, microsecond=0) + timedelta(seconds=offset)
+    if target.timestamp() <= now:
+        target += timedelta(days=1)
+    return target.timestamp()
+
+
+def spread_offset(user_id, window):
+    return (user_id * 2654435761) % (2 ** 32) * window // (2 ** 32)
+
+
+class Scheduler:
+    def __init__(self, path, handler, reschedule, batch_size=200, concurrency=50, owns=None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.handler = handler
+        self.reschedule = reschedule
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.owns = owns or (lambda user_id: True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS schedules (user_id INTEGER NOT NULL, kind TEXT NOT NULL, "
+                               "fire_at REAL NOT NULL, PRIMARY KEY (user_id, kind))")
+        self._heap = []
+        self._next = {}
+        self._pending = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.fired = 0
+        self.failed = 0
+
+    def _load(self):
+        with self._lock:
+            return self._conn.execute("SELECT user_id, kind, fire_at FROM schedules").fetchall()
+
+    def _write(self, rows):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM schedules WHERE user_id = ? AND kind = ?",
+                                   [(user_id, kind) for user_id, kind, fire_at in rows if fire_at is None])
+            self._conn.executemany("INSERT OR REPLACE INTO schedules VALUES (?, ?, ?)",
+                                   [row for row in rows if row[2] is not None])
+
+    def schedule(self, user_id, kind, fire_at):
+        key = (user_id, kind)
+        previous = self._next.get(key)
+        self._next[key] = fire_at
+        self._pending[key] = fire_at
+        heapq.heappush(self._heap, (fire_at, user_id, kind))
+        if previous is None or fire_at < previous:
+            self._wakeup.set()
+
+    def cancel(self, user_id, kind):
+        key = (user_id, kind)
+        self._next.pop(key, None)
+        self._pending[key] = None
+
+    def scheduled(self, user_id, kind):
+        return self._next.get((user_id, kind))
+
+    async def _persist(self):
+        if not self._pending:
+            return
+        rows = [(user_id, kind, fire_at) for (user_id, kind), fire_at in self._pending.items()]
+        self._pending = {}
+        await asyncio.to_thread(self._write, rows)
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+            fire_at, user_id, kind = heapq.heappop(self._heap)
+            if self._next.get((user_id, kind)) == fire_at:
+                del self._next[(user_id, kind)]
+                due.append((user_id, kind, fire_at))
+        return due
+
+    async def _plan(self, user_id, kind, fire_at):
+        try:
+            next_fire_at = await self.reschedule(user_id, kind, fire_at)
+        except Exception:
+            logging.exception(f"Не удалось перепланировать {kind} для пользователя {user_id}")
+            next_fire_at = None
+        if next_fire_at is None:
+            self.cancel(user_id, kind)
+        else:
+            self.schedule(user_id, kind, next_fire_at)
+
+    async def _fire(self, semaphore, user_id, kind, fire_at):
+        async with semaphore:
+            try:
+                await self.handler(user_id, kind, fire_at)
+                self.fired += 1
+            except Exception:
+                self.failed += 1
+                logging.exception(f"Ошибка задачи {kind} для пользователя {user_id}")
+
+    async def _run(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        while True:
+            due = self._pop_due(time.time())
+            if due:
+                # следующий запуск сохраняется до отправки: после рестарта задача не повторится
+                await asyncio.gather(*(self._plan(*item) for item in due))
+                await self._persist()
+                await asyncio.gather(*(self._fire(semaphore, *item) for item in due))
+                continue
+            await self._persist()
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.time() if self._heap else 60
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(0.0, min(timeout, 60)))
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self):
+        for user_id, kind, fire_at in await asyncio.to_thread(self._load):
+            if self.owns(user_id):
+                self._next[(user_id, kind)] = fire_at
+                self._heap.append((fire_at, user_id, kind))
+        heapq.heapify(self._heap)
+        logging.info(f"Загружено {len(self._heap)} запланированных задач")
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def close(self):
+        await self.stop()
+        await self._persist()
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        return {
+            'scheduled': len(self._next),
+            'heap': len(self._heap),
+            'fired': self.fired,
+            'failed': self.failed
+        }
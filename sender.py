@@ -0,0 +1,158 @@
+import asyncio
+import itertools
+import logging
+import time
+from contextvars import ContextVar
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+INTERACTIVE = 0
+BULK = 10
+
+send_priority = ContextVar("send_priority", default=INTERACTIVE)
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+    def block(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        while True:
+            delay = self.delay()
+            if delay <= 0:
+                self.consume()
+                return
+            await asyncio.sleep(delay)
+
+
+class OutboundSender(BaseRequestMiddleware):
+    def __init__(self, global_rate=30, chat_rate=1, chat_burst=3, workers=8, max_retries=3, idle_ttl=60):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.workers = workers
+        self.max_retries = max_retries
+        self.idle_ttl = idle_ttl
+        self._chats = {}
+        self._queue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._tasks = []
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def _chat(self, chat_id):
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = [TokenBucket(self.chat_rate, self.chat_burst), asyncio.Lock(), 0.0]
+        chat[2] = time.monotonic()
+        return chat
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            return await make_request(bot, method)
+        return await self.send(chat_id, lambda: make_request(bot, method), send_priority.get())
+
+    async def send(self, chat_id, call, priority=INTERACTIVE):
+        if not self._tasks:
+            return await call()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((priority, next(self._seq), chat_id, call, future))
+        return await future
+
+    async def _deliver(self, chat_id, call):
+        bucket, lock, _ = self._chat(chat_id)
+        async with lock:
+            for attempt in range(self.max_retries + 1):
+                await bucket.acquire()
+                await self.global_bucket.acquire()
+                try:
+                    return await call()
+                except TelegramRetryAfter as e:
+                    if attempt == self.max_retries:
+                        raise
+                    self.retried += 1
+                    logging.warning(f"Telegram просит подождать {e.retry_after} с (чат {chat_id})")
+                    bucket.block(e.retry_after)
+
+    async def _worker(self):
+        while True:
+            priority, _, chat_id, call, future = await self._queue.get()
+            try:
+                result = await self._deliver(chat_id, call)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                self.failed += 1
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                self.sent += 1
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
+            self._forget_idle()
+
+    def _forget_idle(self):
+        if self.sent % 1000 or len(self._chats) < 10000:
+            return
+        deadline = time.monotonic() - self.idle_ttl
+        for chat_id in [chat_id for chat_id, chat in self._chats.items() if chat[2] < deadline
+                        and not chat[1].locked()]:
+            del self._chats[chat_id]
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout):
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Не отправлено {self._queue.qsize()} сообщений")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def send_message(self, bot, chat_id, text, priority=BULK, **kwargs):
+        token = send_priority.set(priority)
+        try:
+            return await bot.send_message(chat_id, text, **kwargs)
+        finally:
+            send_priority.reset(token)
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'sent': self.sent,
+            'retried': self.retried,
+            'failed': self.failed,
+            'chats': len(self._chats)
+        }
@@ -0,0 +1,268 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from profiles import Profile
+
+
+def dump(profile):
+    # кольца истории в профиле — массивы array, в JSON они пишутся обычными списками
+    return json.dumps(dict(profile), default=list)
+
+
+class MemoryBackend:
+    def __init__(self):
+        self._data = {}
+
+    async def load(self, user_id):
+        data = self._data.get(user_id)
+        return json.loads(data) if data is not None else None
+
+    async def load_all(self):
+        return {user_id: json.loads(data) for user_id, data in self._data.items()}
+
+    async def save_many(self, profiles):
+        for user_id, profile in profiles.items():
+            self._data[user_id] = dump(profile)
+
+    async def delete(self, user_id):
+        self._data.pop(user_id, None)
+
+    async def close(self):
+        pass
+
+
+class SQLiteBackend:
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS users (user_id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+
+    def _load(self, user_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def _load_all(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id, data FROM users").fetchall()
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    def _save_many(self, rows):
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO users VALUES (?, ?)", rows)
+
+    def _delete(self, user_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+
+    async def load(self, user_id):
+        return await asyncio.to_thread(self._load, user_id)
+
+    async def load_all(self):
+        return await asyncio.to_thread(self._load_all)
+
+    async def save_many(self, profiles):
+        rows = [(user_id, dump(profile)) for user_id, profile in profiles.items()]
+        await asyncio.to_thread(self._save_many, rows)
+
+    async def delete(self, user_id):
+        await asyncio.to_thread(self._delete, user_id)
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RedisBackend:
+    def __init__(self, url, prefix="user:"):
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("Для STORAGE_BACKEND=redis установите пакет redis")
+        self._redis = redis.from_url(url)
+        self._prefix = prefix
+
+    async def load(self, user_id):
+        data = await self._redis.get(f"{self._prefix}{user_id}")
+        return json.loads(data) if data is not None else None
+
+    async def load_all(self):
+        profiles = {}
+        keys = []
+        async for key in self._redis.scan_iter(match=f"{self._prefix}*", count=1000):
+            keys.append(key)
+        for i in range(0, len(keys), 1000):
+            chunk = keys[i:i + 1000]
+            for key, data in zip(chunk, await self._redis.mget(chunk)):
+                if data is not None:
+                    profiles[int(key[len(self._prefix):])] = json.loads(data)
+        return profiles
+
+    async def save_many(self, profiles):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for user_id, profile in profiles.items():
+                pipe.set(f"{self._prefix}{user_id}", dump(profile))
+            await pipe.execute()
+
+    async def delete(self, user_id):
+        await self._redis.delete(f"{self._prefix}{user_id}")
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+class UserStore:
+    def __init__(self, backend, cache_size=10000, flush_interval=1.0, batch_size=500, lock_shards=1024):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._cache = OrderedDict()
+        self._dirty = {}
+        self._flushing = {}
+        self._loading = {}
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+        self._locks = [asyncio.Lock() for _ in range(lock_shards)]
+
+    def _cached(self, user_id):
+        profile = self._cache.get(user_id)
+        if profile is not None:
+            self._cache.move_to_end(user_id)
+            return profile
+        profile = self._dirty.get(user_id) or self._flushing.get(user_id)
+        if profile is None:
+            loading = self._loading.get(user_id)
+            if loading is not None and loading[0].done() and not loading[0].cancelled() \
+                    and loading[0].exception() is None:
+                profile = loading[0].result()
+        if profile is not None:
+            self._remember(user_id, profile)
+        return profile
+
+    async def _load(self, user_id):
+        loaded = await self.backend.load(user_id)
+        profile = self._cached(user_id)
+        if profile is None and loaded is not None:
+            profile = Profile.from_dict(loaded)
+            self._remember(user_id, profile)
+        return profile
+
+    async def get(self, user_id):
+        profile = self._cached(user_id)
+        if profile is not None:
+            return profile
+        # все промахи по одному пользователю ждут одну загрузку, а загруженный профиль остаётся
+        # доступным, пока не проснётся последний из них, иначе в памяти окажутся две копии
+        loading = self._loading.get(user_id)
+        if loading is None:
+            loading = self._loading[user_id] = [asyncio.ensure_future(self._load(user_id)), 0]
+        loading[1] += 1
+        try:
+            profile = await asyncio.shield(loading[0])
+            cached = self._cached(user_id)
+            return cached if cached is not None else profile
+        finally:
+            loading[1] -= 1
+            if not loading[1] and self._loading.get(user_id) is loading:
+                del self._loading[user_id]
+
+    def set(self, user_id, profile):
+        self._remember(user_id, Profile.from_dict(profile))
+        self.mark_dirty(user_id)
+
+    def mark_dirty(self, user_id):
+        profile = self._cache.get(user_id)
+        if profile is not None:
+            self._dirty[user_id] = profile
+            if len(self._dirty) >= self.batch_size and self._flush_task is not None:
+                asyncio.get_running_loop().create_task(self.flush())
+
+    def lock(self, user_id):
+        return self._locks[user_id % len(self._locks)]
+
+    async def increment(self, user_id, **deltas):
+        profile = await self.get(user_id)
+        if profile is None:
+            return None
+        # после последнего await изменения выполняются без переключения задач
+        for field, delta in deltas.items():
+            profile[field] = profile.get(field, 0) + delta
+        self._remember(user_id, profile)
+        self.mark_dirty(user_id)
+        return profile
+
+    async def scan(self):
+        profiles = {user_id: Profile.from_dict(profile)
+                    for user_id, profile in (await self.backend.load_all()).items()}
+        profiles.update(self._flushing)
+        profiles.update(self._dirty)
+        profiles.update(self._cache)
+        return profiles
+
+    async def delete(self, user_id):
+        self._cache.pop(user_id, None)
+        self._dirty.pop(user_id, None)
+        self._flushing.pop(user_id, None)
+        await self.backend.delete(user_id)
+
+    def _remember(self, user_id, profile):
+        self._cache[user_id] = profile
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            batch, self._dirty = self._dirty, {}
+            self._flushing = batch
+            try:
+                await self.backend.save_many(batch)
+            except Exception:
+                logging.exception("Не удалось сохранить профили пользователей")
+                for user_id, profile in batch.items():
+                    self._dirty.setdefault(user_id, profile)
+            finally:
+                self._flushing = {}
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+        await self.backend.close()
+
+
+def create_backend(name, path=None, url=None):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "sqlite":
+        return SQLiteBackend(path)
+    if name == "redis":
+        return RedisBackend(url)
+    raise ValueError(f"Неизвестное хранилище: {name}")
@@ -0,0 +1,101 @@
+import csv
+import os
+from food_db import BUNDLED_CSV, normalize_name, read_bundled_csv
+
+DICTIONARY_CSV = os.path.join(os.path.dirname(BUNDLED_CSV), 'translations.csv')
+MAX_PHRASE_WORDS = 4
+ENDINGS = sorted(('ыми', 'ими', 'ого', 'его', 'ому', 'ему', 'ами', 'ями', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ый',
+                  'ий', 'ой', 'ую', 'юю', 'ым', 'им', 'ом', 'ем', 'ых', 'их', 'ов', 'ев', 'ах', 'ях',
+                  'а', 'я', 'ы', 'и', 'у', 'ю', 'е', 'о'), key=len, reverse=True)
+
+
+def stem(word):
+    stripped = True
+    while stripped:
+        stripped = False
+        for ending in ENDINGS:
+            if word.endswith(ending) and len(word) - len(ending) >= 3:
+                word = word[:-len(ending)]
+                stripped = True
+                break
+    return word
+
+
+def stem_phrase(phrase):
+    return ' '.join(stem(word) for word in phrase.split())
+
+
+def stem_with_endings(phrase):
+    stems = [stem(word) for word in phrase.split()]
+    return ' '.join(stems), tuple(len(word) - len(word_stem) for word, word_stem in zip(phrase.split(), stems))
+
+
+def compatible_endings(first, second):
+    # «сырой» и «сыр» дают одну основу, но прилагательное с нулевым окончанием существительного не совпадает:
+    # формы одного слова отличаются длиной окончания не больше чем на букву («гречку» — «гречка»)
+    return all(abs(a - b) <= 1 for a, b in zip(first, second))
+
+
+class FoodDictionary:
+    def __init__(self, entries):
+        self.phrases = {}
+        self.stems = {}
+        for ru, en in entries:
+            key = normalize_name(ru)
+            if key and en:
+                self.phrases.setdefault(key, en)
+                stemmed, endings = stem_with_endings(key)
+                self.stems.setdefault(stemmed, []).append((endings, en))
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def _phrase(self, words):
+        phrase = ' '.join(words)
+        if phrase in self.phrases:
+            return self.phrases[phrase]
+        stemmed, endings = stem_with_endings(phrase)
+        for entry_endings, en in self.stems.get(stemmed, ()):
+            if compatible_endings(endings, entry_endings):
+                return en
+        return None
+
+    def translate(self, text):
+        words = normalize_name(text).split()
+        translated = []
+        i = 0
+        while i < len(words):
+            for j in range(min(len(words), i + MAX_PHRASE_WORDS), i, -1):
+                phrase = self._phrase(words[i:j])
+                if phrase:
+                    translated.append(phrase)
+                    i = j
+                    break
+            else:
+                self.misses += 1
+                return None
+        if not translated:
+            return None
+        self.hits += 1
+        return ' '.join(translated)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'size': len(self)
+        }
+
+
+def read_dictionary_csv(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return [(row['ru'], row['en']) for row in csv.DictReader(f)]
+
+
+def load_dictionary(path=DICTIONARY_CSV):
+    entries = [(name, names[1]) for _, _, names in read_bundled_csv(BUNDLED_CSV) for name in names[:1] + names[2:]]
+    return FoodDictionary(read_dictionary_csv(path) + entries)
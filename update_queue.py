@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from collections import OrderedDict
+
+ACCEPTED = "accepted"
+DUPLICATE = "duplicate"
+OVERLOADED = "overloaded"
+
+
+class UpdateQueue:
+    def __init__(self, handler, consumers=8, maxsize=1000, dedup_size=10000):
+        self.handler = handler
+        self.consumers = consumers
+        self.dedup_size = dedup_size
+        shard_size = max(1, maxsize // consumers)
+        self._shards = [asyncio.Queue(maxsize=shard_size) for _ in range(consumers)]
+        self._seen = OrderedDict()
+        self._tasks = []
+        self.accepted = 0
+        self.duplicates = 0
+        self.overloaded = 0
+        self.processed = 0
+        self.failed = 0
+
+    def submit(self, update, key=None):
+        if update.update_id in self._seen:
+            self.duplicates += 1
+            return DUPLICATE
+        shard = self._shards[(key or 0) % self.consumers]
+        try:
+            shard.put_nowait(update)
+        except asyncio.QueueFull:
+            self.overloaded += 1
+            return OVERLOADED
+        self._remember(update.update_id)
+        self.accepted += 1
+        return ACCEPTED
+
+    async def put(self, update, key=None):
+        # для polling и replay: вместо отказа ждём, пока в шарде освободится место
+        if update.update_id in self._seen:
+            self.duplicates += 1
+            return DUPLICATE
+        self._remember(update.update_id)
+        await self._shards[(key or 0) % self.consumers].put(update)
+        self.accepted += 1
+        return ACCEPTED
+
+    def _remember(self, update_id):
+        self._seen[update_id] = None
+        while len(self._seen) > self.dedup_size:
+            self._seen.popitem(last=False)
+
+    async def _consume(self, shard):
+        while True:
+            update = await shard.get()
+            try:
+                await self.handler(update)
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logging.exception(f"Ошибка при обработке обновления {update.update_id}")
+            finally:
+                shard.task_done()
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._consume(shard)) for shard in self._shards]
+
+    async def join(self):
+        await asyncio.gather(*(shard.join() for shard in self._shards))
+
+    async def stop(self, timeout):
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Очередь не опустела за {timeout} с, осталось {self.depth()} обновлений")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def depth(self):
+        return sum(shard.qsize() for shard in self._shards)
+
+    def stats(self):
+        return {
+            'depth': self.depth(),
+            'max_shard_depth': max(shard.qsize() for shard in self._shards),
+            'capacity': sum(shard.maxsize for shard in self._shards),
+            'accepted': self.accepted,
+            'duplicates': self.duplicates,
+            'overloaded': self.overloaded,
+            'processed': self.processed,
+            'failed': self.failed
+        }
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import logging
+import time
+from aiogram import types
+from aiogram.exceptions import TelegramUnauthorizedError
+from workers import update_user_id
+
+SOURCES = ('webhook', 'polling', 'replay')
+
+
+def update_key(update):
+    try:
+        event = getattr(update, update.event_type)
+    except Exception:
+        return None
+    sender = getattr(event, 'from_user', None) or getattr(event, 'user', None)
+    if sender is not None:
+        return sender.id
+    chat = getattr(event, 'chat', None)
+    return chat.id if chat is not None else None
+
+
+def read_updates(paths):
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+class UpdateRecorder:
+    def __init__(self, path):
+        self._file = open(path, "a", encoding='utf-8')
+        self.written = 0
+
+    def write(self, body):
+        self._file.write(json.dumps(body, ensure_ascii=False) + "\n")
+        self.written += 1
+
+    def close(self):
+        self._file.close()
+
+
+class PollingSource:
+    def __init__(self, bot, queue, timeout=30, limit=100, allowed_updates=None, max_backoff=30.0, recorder=None):
+        self.bot = bot
+        self.queue = queue
+        self.timeout = timeout
+        self.limit = limit
+        self.allowed_updates = allowed_updates
+        self.max_backoff = max_backoff
+        self.recorder = recorder
+        self.offset = None
+        self.received = 0
+        self.requests = 0
+        self.errors = 0
+
+    async def run(self):
+        await self.bot.delete_webhook()
+        logging.info(f"Long polling запущен: timeout={self.timeout} с, limit={self.limit}")
+        backoff = 1.0
+        while True:
+            try:
+                updates = await self.bot.get_updates(offset=self.offset, limit=self.limit, timeout=self.timeout,
+                                                     allowed_updates=self.allowed_updates,
+                                                     request_timeout=self.timeout + 10)
+            except TelegramUnauthorizedError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logging.warning(f"Ошибка getUpdates: {e!r}, повтор через {backoff:.0f} с")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            backoff = 1.0
+            self.requests += 1
+            self.received += len(updates)
+            # обработка идёт в потребителях очереди, а цикл сразу возвращается к getUpdates
+            for update in updates:
+                if self.recorder is not None:
+                    self.recorder.write(update.model_dump(mode='json', exclude_none=True))
+                await self.queue.put(update, key=update_key(update))
+                self.offset = update.update_id + 1
+
+    def stats(self):
+        return {'offset': self.offset, 'received': self.received, 'requests': self.requests, 'errors': self.errors}
+
+
+class ReplaySource:
+    def __init__(self, paths, queue):
+        self.paths = paths
+        self.queue = queue
+        self.sent = 0
+        self.invalid = 0
+        self.elapsed = 0.0
+
+    async def run(self):
+        processed, failed = self.queue.processed, self.queue.failed
+        started = time.perf_counter()
+        for body in read_updates(self.paths):
+            try:
+                update = types.Update(**body)
+            except (TypeError, ValueError):
+                self.invalid += 1
+                continue
+            await self.queue.put(update, key=update_user_id(body))
+            self.sent += 1
+        await self.queue.join()
+        self.elapsed = time.perf_counter() - started
+        return {**self.stats(), 'processed': self.queue.processed - processed, 'failed': self.queue.failed - failed}
+
+    def stats(self):
+        return {'sent': self.sent, 'invalid': self.invalid, 'elapsed': self.elapsed,
+                'updates_per_second': self.sent / self.elapsed if self.elapsed else 0.0}
@@ -0,0 +1,81 @@
+import logging
+import os
+import secrets
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+INTERNAL_HOST = "127.0.0.1"
+
+
+def update_user_id(body):
+    for value in body.values():
+        if isinstance(value, dict):
+            sender = value.get('from') or value.get('user')
+            if isinstance(sender, dict) and 'id' in sender:
+                return sender['id']
+            chat = value.get('chat')
+            if isinstance(chat, dict) and 'id' in chat:
+                return chat['id']
+    return None
+
+
+def worker_for_user(user_id, worker_count):
+    if user_id is None or worker_count <= 1:
+        return 0
+    return user_id % worker_count
+
+
+def internal_port(base_port, worker_index):
+    return base_port + worker_index
+
+
+def internal_socket(base_port, worker_index):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((INTERNAL_HOST, internal_port(base_port, worker_index)))
+    return sock
+
+
+def run_master(worker_count, drain_timeout):
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise RuntimeError("Многопроцессный режим требует поддержки SO_REUSEPORT")
+    env = dict(os.environ, INTERNAL_TOKEN=os.environ.get("INTERNAL_TOKEN") or secrets.token_hex(16))
+    script = os.path.abspath(sys.argv[0])
+
+    def spawn(index):
+        command = [sys.executable, script, "--workers", str(worker_count), "--worker-index", str(index)]
+        return subprocess.Popen(command, env=env)
+
+    processes = [spawn(i) for i in range(worker_count)]
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        logging.info(f"Получен сигнал {signum}, останавливаем {worker_count} воркеров")
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logging.info(f"Запущено {worker_count} воркеров")
+
+    while not stopping:
+        for index, process in enumerate(processes):
+            code = process.poll()
+            if code is not None and not stopping:
+                logging.warning(f"Воркер {index} завершился с кодом {code}, перезапуск")
+                processes[index] = spawn(index)
+        time.sleep(0.5)
+
+    deadline = time.monotonic() + drain_timeout + 5
+    for process in processes:
+        try:
+            process.wait(timeout=max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            process.kill()
+    logging.info("Все воркеры остановлены")
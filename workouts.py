@@ -0,0 +1,55 @@
+import csv
+import os
+from food_db import BUNDLED_CSV, FoodIndex, build_index, normalize_name
+from translation import stem_phrase
+
+WORKOUTS_CSV = os.path.join(os.path.dirname(BUNDLED_CSV), 'workouts.csv')
+MIN_SCORE = 0.5
+
+
+def read_workouts_csv(path):
+    workouts = []
+    with open(path, encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            names = [row['name_ru'], row['name_en']]
+            names += [alias for alias in (row.get('aliases') or '').split('|') if alias]
+            workouts.append((row['name_ru'], float(row['met']), names))
+    return workouts
+
+
+def calculate_workout_calories(met, weight, minutes):
+    return met * weight * minutes / 60
+
+
+class WorkoutCatalog:
+    def __init__(self, workouts):
+        self._aliases = {}
+        self._met = {}
+        for name, met, names in workouts:
+            workout = {'name': name, 'met': met}
+            self._met[name] = met
+            for alias in names:
+                key = normalize_name(alias)
+                self._aliases.setdefault(key, workout)
+                self._aliases.setdefault(stem_phrase(key), workout)
+        self._fuzzy = FoodIndex(build_index(workouts))
+
+    def __len__(self):
+        return len(self._met)
+
+    def lookup(self, query):
+        key = normalize_name(query)
+        workout = self._aliases.get(key) or self._aliases.get(stem_phrase(key))
+        if workout is not None:
+            return workout
+        match = self._fuzzy.lookup(key, MIN_SCORE)
+        if match is None:
+            return None
+        return {'name': match['name'], 'met': self._met[match['name']]}
+
+    def close(self):
+        self._fuzzy.close()
+
+
+def load_catalog(path=WORKOUTS_CSV):
+    return WorkoutCatalog(read_workouts_csv(path))